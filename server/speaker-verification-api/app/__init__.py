@@ -1,11 +1,30 @@
 import os
-from flask import Flask
+from flask import Flask, jsonify
 from . import config
-from .routes import verification_bp,noise_bp, detection_bp,hash_bp,spectrogram_bp,transcript_bp,report_bp
+from .routes import verification_bp,noise_bp, detection_bp,hash_bp,spectrogram_bp,transcript_bp,report_bp,identification_bp,jobs_bp,models_bp,reference_bp,fingerprint_bp
+from .services.job_queue import report_jobs
+from .services.forensics_speaker_traits_service import forensics_full_bp
+from .services.ingest_service import IngestRequest, UploadTooLargeError
+from .utils.workspace import cleanup_request_workspace
 
 
-def create_app():
+def create_app(start_job_workers=True):
+    """
+    Build the Flask app. Pass start_job_workers=False when the app is created in
+    a pre-fork master (see wsgi.py); workers then start the job threads after fork.
+    """
     app = Flask(__name__)
+    # Uploads are hashed and size-checked while the form is parsed (ingest_service)
+    app.request_class = IngestRequest
+    # Reject oversized request bodies before they are parsed
+    app.config["MAX_CONTENT_LENGTH"] = config.MAX_REQUEST_BYTES
+
+    @app.errorhandler(UploadTooLargeError)
+    def upload_too_large(e):
+        return jsonify({"error": str(e)}), 413
+
+    # Each request gets a private scratch directory (tmpfs when available)
+    app.teardown_request(cleanup_request_workspace)
     
     os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
     
@@ -17,6 +36,16 @@ def create_app():
     app.register_blueprint(spectrogram_bp)
     app.register_blueprint(transcript_bp)
     app.register_blueprint(report_bp)
+    app.register_blueprint(identification_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(models_bp)
+    app.register_blueprint(reference_bp)
+    app.register_blueprint(fingerprint_bp)
+    app.register_blueprint(forensics_full_bp)
+
+    # Background report workers (set JOB_WORKERS = 0 and run worker.py to use a separate process)
+    if start_job_workers and config.JOB_WORKERS > 0:
+        report_jobs.start()
    
    
     # Serve spectrogram images
@@ -2,3 +2,101 @@ UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'mp3', 'wav', 'flac', 'ogg', 'mp4'}
 MODEL_SOURCE = "speechbrain/spkrec-ecapa-voxceleb"
 MODEL_SAVEDIR = "pretrained_models/spkrec-ecapa-voxceleb"
+WHISPER_MODEL = "small"  # default size; requests may pick another from WHISPER_MODEL_SIZES
+WHISPER_MODEL_SIZES = ("tiny", "base", "small", "medium")
+WHISPER_BATCH_SIZE = 8  # 30 s chunks per batched decode
+WHISPER_LANGUAGE = None  # None = detect per chunk
+TRANSCRIPT_ALIGN_MAX_EDITS = 2000  # beyond this the differing middle is reported as one span
+TRANSCRIPT_MAX_DIFFERENCES = 200
+
+# Speaker identification (one-to-many)
+SPEAKER_INDEX_DIR = "data/speaker_index"  # memmapped embedding matrix + SQLite id mapping
+SPEAKER_INDEX_DTYPE = "float16"  # or "int8" (per-row scale); fixed when the store is created
+SPEAKER_INDEX_BLOCK_ROWS = 65536  # rows scored per block during search
+SPEAKER_INDEX_COMPACT_RATIO = 0.25  # rewrite the store once this share of its rows is dead
+SPEAKER_INDEX_PATH = "data/speaker_index.npz"  # legacy .npz index, imported once if present
+VERIFICATION_THRESHOLD = 0.25  # cosine score above which two voices are the same speaker
+IDENTIFY_TOP_K = 5
+
+# Reference profiles (embedding, transcript, noise profile and hashes computed at enrollment)
+REFERENCE_PROFILE_DIR = "data/references"
+
+# Report pipeline stage scheduling
+STAGE_THREAD_WORKERS = 6
+STAGE_PROCESS_WORKERS = 2
+STAGE_CONCURRENCY_LIMITS = {  # max simultaneous runs per shared model/resource
+    "whisper": 1,
+    "ecapa": 1,
+}
+
+# Asynchronous report jobs
+JOB_DB_PATH = "data/jobs.sqlite3"
+JOB_FOLDER = "data/jobs"
+JOB_MAX_PENDING = 32   # queued + running jobs before submissions are rejected
+JOB_WORKERS = 1        # report worker threads started inside the web process
+JOB_POLL_INTERVAL = 2.0
+JOB_RESULT_TTL = 24 * 3600  # seconds a finished job and its PDF are kept
+
+# Content-addressed analysis result cache
+CACHE_ENABLED = True
+CACHE_DIR = "data/cache"
+CACHE_MEMORY_ITEMS = 512
+CACHE_MAX_DISK_BYTES = 512 * 1024 * 1024
+
+# Speaker embedding cache (per audio content hash)
+EMBEDDING_CACHE_DIR = "data/embeddings"
+EMBEDDING_CACHE_MEMORY_ITEMS = 4096
+
+# Upload ingestion
+MAX_UPLOAD_BYTES = 1024 * 1024 * 1024        # per file
+MAX_REQUEST_BYTES = 2 * MAX_UPLOAD_BYTES + 1024 * 1024  # two files plus form overhead
+INGEST_CHUNK_SIZE = 1024 * 1024
+
+# Per-request scratch workspaces; None picks /dev/shm when writable, else the system temp dir
+WORKSPACE_ROOT = None
+
+# Deepfake detector micro-batching
+DETECT_BATCH_MAX_SIZE = 8
+DETECT_BATCH_MAX_WAIT_MS = 10
+DETECT_BATCH_MAX_SAMPLES = 8 * 16000 * 30  # padded samples per forward pass
+
+# Sliding-window deepfake scoring for long recordings
+DETECT_WINDOW_SECONDS = 4.0
+DETECT_HOP_SECONDS = 2.0
+DETECT_WINDOW_BATCH = 8
+DETECT_LONG_AUDIO_SECONDS = 30  # longer inputs are scored window by window
+
+# Spectrogram anomaly detection (dB relative to the recording's peak)
+SPECTRO_ANOMALY_DB = -15.0
+SPECTRO_ANOMALY_MIN_CELLS = 4  # smaller connected regions are ignored
+SPECTRO_MAX_REGIONS = 50  # regions listed in results
+SPECTRO_MAX_BOXES = 500  # regions outlined on the highlighted image
+# Report risk levels in anomaly regions per minute; clean speech samples give roughly 200-400
+SPECTRO_MODERATE_REGIONS_PER_MIN = 600
+SPECTRO_HIGH_REGIONS_PER_MIN = 1200
+
+# Streaming spectral analysis for long recordings
+STREAM_STFT_BLOCK_FRAMES = 256  # STFT hops read per block
+STREAM_SPECTRO_MIN_SECONDS = 600  # report spectrograms of longer recordings are streamed
+
+# Background-noise profiling (minimum statistics on the STFT)
+NOISE_BAND_EDGES_HZ = (0, 250, 500, 1000, 2000, 4000, 8000)
+NOISE_STEP_SECONDS = 0.25  # resolution of the noise-floor track
+NOISE_WINDOW_SECONDS = 3.0  # minimum-statistics search window (centred)
+NOISE_SMOOTH_FRAMES = 3  # power smoothing before the minimum search
+NOISE_SPLICE_DB = 6.0  # broadband floor jump flagged as a possible splice
+NOISE_MAX_SPLICES = 50
+NOISE_LEVEL_DIFF_DB = 6.0  # two recordings' floors differ significantly above this
+NOISE_SHAPE_DIFF_DB = 4.0  # ... or when their band floors differ in shape by this (RMS dB)
+
+# Landmark audio fingerprinting (spectral peak pairs, SQLite inverted index)
+FINGERPRINT_DB_PATH = "data/fingerprints.sqlite3"
+FINGERPRINT_NEIGHBORHOOD = (15, 9)  # (bins, frames) a peak must dominate; ~117 Hz x 0.29 s
+FINGERPRINT_MIN_PEAK_DB = -60.0  # relative to the recording's peak
+FINGERPRINT_PEAK_MARGIN_DB = 15.0  # above the median level of the peak's frequency bin
+FINGERPRINT_PEAKS_PER_SECOND = 30
+FINGERPRINT_FAN_OUT = 5  # targets paired with each anchor peak
+FINGERPRINT_MAX_DT = 63  # frames (~2 s) between anchor and target
+FINGERPRINT_MAX_DF = 127  # quantised bins (2 STFT bins each) between anchor and target
+FINGERPRINT_MIN_MATCHES = 8  # time-aligned hashes needed to report a match
+FINGERPRINT_MAX_MATCHES = 10
@@ -2,15 +2,22 @@ import os
 from flask import Blueprint, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 import datetime
-import tempfile
 
 from .services.verification_service import process_and_verify_files
 from .services.background_service import analyze_background_noise
-from app.services.ai_detection_service import VoiceDetector
-from .services.hash_service import compute_file_hashes
+from app.services.ai_detection_service import detect_synthetic
+from app.services.model_registry import models
+from .services.ingest_service import hash_upload, error_response
 from .services.spectrogram_service import generate_spectrogram
-from app.services.transcript_service import transcribe_audio, compare_transcripts
-from app.services.report_service import generate_pdf_report, preprocess_audio, _safe_remove
+from app.services.transcript_service import transcribe_pair, compare_transcripts
+from app.services.report_service import generate_pdf_report, preprocess_audio
+from app.utils.workspace import request_workspace
+from app.services.job_queue import report_jobs, QueueFullError, DONE, FAILED
+from app.services.speaker_index_service import enroll_speaker, identify_speaker, speaker_index
+from app.services.fingerprint_service import check_recording, fingerprint_index
+from app.services.reference_profile_service import (
+    enroll_reference, get_reference, summarize_reference, reference_store)
+from . import config
 
 # Define Blueprints
 verification_bp = Blueprint('verification_api', __name__)
@@ -20,16 +27,17 @@ hash_bp = Blueprint("hash_api", __name__)
 spectrogram_bp = Blueprint("spectrogram_api", __name__)
 transcript_bp = Blueprint("transcript_bp", __name__)
 report_bp = Blueprint("report_api", __name__)
+identification_bp = Blueprint("identification_api", __name__)
+jobs_bp = Blueprint("jobs_api", __name__)
+models_bp = Blueprint("models_api", __name__)
+reference_bp = Blueprint("reference_api", __name__)
+fingerprint_bp = Blueprint("fingerprint_api", __name__)
 
 
 # Create and configure upload directories
-UPLOAD_FOLDER = "uploads"
 SPECTROGRAM_FOLDER = "reports/spectrograms"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(SPECTROGRAM_FOLDER, exist_ok=True)
 
-voice_detector = VoiceDetector()
-
 # ------------------ Verification Endpoint ------------------
 @verification_bp.route('/verify', methods=['POST'])
 def verify_endpoint():
@@ -42,7 +50,6 @@ def verify_endpoint():
     if file1.filename == '' or file2.filename == '':
         return jsonify({"error": "No file selected for one or both parts"}), 400
 
-    path1, path2 = None, None
     try:
         # Preprocess and save files to disk
         path1 = preprocess_audio(file1)
@@ -51,11 +58,56 @@ def verify_endpoint():
         result = process_and_verify_files(path1, path2)
         return jsonify(result), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        # Cleanup temporary files
-        _safe_remove(path1)
-        _safe_remove(path2)
+        return error_response(e)
+
+# ------------------ Enrollment / Identification Endpoints ------------------
+@identification_bp.route('/enroll', methods=['POST'])
+def enroll_endpoint():
+    speaker_id = request.form.get('speaker_id', '').strip()
+    if not speaker_id:
+        return jsonify({"error": "Please provide a 'speaker_id'"}), 400
+    if 'audio' not in request.files or request.files['audio'].filename == '':
+        return jsonify({"error": "Please provide an 'audio' file"}), 400
+
+    try:
+        path = preprocess_audio(request.files['audio'])
+        result = enroll_speaker(speaker_id, path)
+        return jsonify(result), 201
+    except Exception as e:
+        return error_response(e)
+
+
+@identification_bp.route('/enroll', methods=['GET'])
+def list_enrolled_endpoint():
+    return jsonify({"speakers": speaker_index.speakers()}), 200
+
+
+@identification_bp.route('/enroll/<speaker_id>', methods=['DELETE'])
+def unenroll_endpoint(speaker_id):
+    if not speaker_index.remove(speaker_id):
+        return jsonify({"error": f"Speaker '{speaker_id}' is not enrolled"}), 404
+    return jsonify({"speaker_id": speaker_id, "removed": True}), 200
+
+
+@identification_bp.route('/identify', methods=['POST'])
+def identify_endpoint():
+    if 'audio' not in request.files or request.files['audio'].filename == '':
+        return jsonify({"error": "Please provide an 'audio' file"}), 400
+
+    try:
+        top_k = int(request.form.get('top_k', config.IDENTIFY_TOP_K))
+    except ValueError:
+        return jsonify({"error": "'top_k' must be an integer"}), 400
+    if top_k < 1:
+        return jsonify({"error": "'top_k' must be at least 1"}), 400
+
+    try:
+        path = preprocess_audio(request.files['audio'])
+        result = identify_speaker(path, top_k)
+        return jsonify(result), 200
+    except Exception as e:
+        return error_response(e)
+
 
 # ------------------ Noise Endpoint ------------------
 @noise_bp.route('/noise', methods=['POST'])
@@ -69,10 +121,10 @@ def noise_consistency_endpoint():
     if file1.filename == '':
         return jsonify({"error": "No file selected for audio1"}), 400
 
-    path1, path2 = None, None
     try:
         # Preprocess and save files to disk
         path1 = preprocess_audio(file1)
+        path2 = None
         if file2 and file2.filename != '':
             path2 = preprocess_audio(file2)
 
@@ -80,11 +132,7 @@ def noise_consistency_endpoint():
         result = analyze_background_noise(path1, path2)
         return jsonify(result), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        # Cleanup temporary files
-        _safe_remove(path1)
-        _safe_remove(path2)
+        return error_response(e)
 
 
 # ------------------ AI Detection Endpoint ------------------
@@ -97,19 +145,20 @@ def detect_voice():
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
 
-    file_path = None
     try:
         # Preprocess and save file to disk
         file_path = preprocess_audio(file)
         
+        # windowed=true forces a per-segment timeline; by default long recordings get one
+        windowed = request.form.get('windowed')
+        if windowed is not None:
+            windowed = windowed.lower() in ('1', 'true', 'yes')
+
         # Pass file path to the service function
-        result = voice_detector.is_synthetic(file_path)
+        result = detect_synthetic(file_path, windowed=windowed)
         return jsonify(result), 200
     except Exception as e:
-        return jsonify({"error": f"An error occurred during detection: {e}"}), 500
-    finally:
-        # Cleanup temporary file
-        _safe_remove(file_path)
+        return error_response(e, f"An error occurred during detection: {e}")
 
 
 # ------------------ Hash Endpoint ------------------
@@ -123,19 +172,16 @@ def file_hash_endpoint():
         return jsonify({"error": "Empty filename"}), 400
 
     filename = secure_filename(file.filename)
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(file_path)
 
     try:
-        hashes = compute_file_hashes(file_path)
+        # Hashed in one streaming pass over the request body; nothing is saved
+        hashes = hash_upload(file)
         return jsonify({
             "file_name": filename,
             "hash_sha256": hashes["hash_sha256"],
         }), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        _safe_remove(file_path)
+        return error_response(e)
 
 
 # ------------------ Spectrogram Endpoint ------------------
@@ -148,20 +194,17 @@ def generate_spectrogram_image():
     if file.filename == "":
         return {"error": "Empty filename"}, 400
 
-    file_path = None
-    spectrogram_file_path = None
     try:
+        # Both the WAV and the PNG live in the request workspace; send_file holds the
+        # PNG open, so removing the workspace at teardown is safe.
+        workspace = request_workspace()
         file_path = preprocess_audio(file)
-        spectrogram_file_name = generate_spectrogram(file_path)
-        spectrogram_file_path = os.path.abspath(os.path.join(SPECTROGRAM_FOLDER, spectrogram_file_name))
+        spectrogram_file_name = generate_spectrogram(file_path, output_dir=workspace.path)
+        spectrogram_file_path = os.path.join(workspace.path, spectrogram_file_name)
 
         return send_file(spectrogram_file_path, mimetype="image/png")
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        _safe_remove(file_path)
-        # Note: The spectrogram file should be managed by the calling service, not deleted here,
-        # or you can add a timer to delete it later. For this example, we'll assume it's kept.
+        return error_response(e)
 
 
 # ------------------ Transcript Endpoint ------------------
@@ -176,46 +219,54 @@ def transcript_compare_endpoint():
     if original_file.filename == "" or suspected_file.filename == "":
         return jsonify({"error": "One or both files have empty filename"}), 400
 
-    original_path, suspected_path = None, None
     try:
         # Preprocess and save files to disk
         original_path = preprocess_audio(original_file)
         suspected_path = preprocess_audio(suspected_file)
         
-        # Transcribe and compare
-        original_text = transcribe_audio(original_path)
-        suspected_text = transcribe_audio(suspected_path)
-        result = compare_transcripts(original_text, suspected_text)
+        # Transcribe and compare; model_size optionally overrides config.WHISPER_MODEL
+        model_size = request.form.get("model_size")
+        original, suspected = transcribe_pair(original_path, suspected_path, model_size=model_size)
+        result = compare_transcripts(
+            original["text"], suspected["text"], original["segments"], suspected["segments"]
+        )
 
         return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        # Cleanup temporary files
-        _safe_remove(original_path)
-        _safe_remove(suspected_path)
+        return error_response(e)
 
 
 #
 @report_bp.route("/generate-report", methods=["POST"])
 def generate_report():
-    if "original_audio" not in request.files or "suspected_audio" not in request.files:
-        return {"error": "Provide both original_audio and suspected_audio"}, 400
+    # An enrolled reference id can stand in for the original recording
+    reference_id = request.form.get("reference_id", "").strip()
+    if "suspected_audio" not in request.files or ("original_audio" not in request.files and not reference_id):
+        return {"error": "Provide suspected_audio and either original_audio or reference_id"}, 400
 
-    original_file = request.files["original_audio"]
     suspected_file = request.files["suspected_audio"]
 
-    original_path, suspected_path = None, None
     try:
+        original_path = None
+        reference = None
+        if reference_id:
+            try:
+                reference = get_reference(reference_id)
+            except KeyError as e:
+                return jsonify({"error": str(e.args[0])}), 404
+
         # Preprocess and save the files to get their paths
-        original_path = preprocess_audio(original_file)
+        if reference is None:
+            original_path = preprocess_audio(request.files["original_audio"])
         suspected_path = preprocess_audio(suspected_file)
 
         report_id = f"REP-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
         
         # Pass the file paths to generate_pdf_report
         # This function should now handle all logic and return the PDF buffer.
-        pdf_buffer = generate_pdf_report(original_path, suspected_path, report_id)
+        pdf_buffer = generate_pdf_report(original_path, suspected_path, report_id, reference=reference)
 
         # The pdf_buffer (BytesIO object) is sent directly as the file.
         return send_file(
@@ -225,8 +276,132 @@ def generate_report():
             mimetype="application/pdf"
         )
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        # Cleanup temporary files
-        _safe_remove(original_path)
-        _safe_remove(suspected_path)
\ No newline at end of file
+        return error_response(e)
+
+
+# ------------------ Reference Profiles ------------------
+@reference_bp.route("/references", methods=["POST"])
+def enroll_reference_endpoint():
+    reference_id = request.form.get("reference_id", "").strip()
+    if not reference_id:
+        return jsonify({"error": "Please provide a 'reference_id'"}), 400
+    if "audio" not in request.files or request.files["audio"].filename == "":
+        return jsonify({"error": "Please provide an 'audio' file"}), 400
+    model_size = request.form.get("model_size") or None
+    if model_size and model_size not in config.WHISPER_MODEL_SIZES:
+        return jsonify({"error": f"Unsupported Whisper model size '{model_size}'"}), 400
+
+    try:
+        path = preprocess_audio(request.files["audio"])
+        result = enroll_reference(reference_id, path, model_size=model_size)
+        return jsonify(result), 201
+    except Exception as e:
+        return error_response(e)
+
+
+@reference_bp.route("/references", methods=["GET"])
+def list_references_endpoint():
+    return jsonify({"references": [
+        {"reference_id": p["reference_id"], "enrolled_at": p["enrolled_at"], "duration_sec": p["duration_sec"]}
+        for p in reference_store.profiles()
+    ]}), 200
+
+
+@reference_bp.route("/references/<reference_id>", methods=["GET"])
+def get_reference_endpoint(reference_id):
+    try:
+        return jsonify(summarize_reference(get_reference(reference_id))), 200
+    except KeyError as e:
+        return jsonify({"error": str(e.args[0])}), 404
+
+
+@reference_bp.route("/references/<reference_id>", methods=["DELETE"])
+def delete_reference_endpoint(reference_id):
+    if not reference_store.remove(reference_id):
+        return jsonify({"error": f"Reference '{reference_id}' is not enrolled"}), 404
+    return jsonify({"reference_id": reference_id, "removed": True}), 200
+
+
+# ------------------ Asynchronous Report Jobs ------------------
+@jobs_bp.route("/jobs/generate-report", methods=["POST"])
+def submit_report_job():
+    if "original_audio" not in request.files or "suspected_audio" not in request.files:
+        return jsonify({"error": "Provide both original_audio and suspected_audio"}), 400
+
+    original_file = request.files["original_audio"]
+    suspected_file = request.files["suspected_audio"]
+    if original_file.filename == "" or suspected_file.filename == "":
+        return jsonify({"error": "One or both files have empty filename"}), 400
+
+    try:
+        job_id = report_jobs.submit_report(original_file, suspected_file)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+    except Exception as e:
+        return error_response(e)
+
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+    }), 202
+
+
+@jobs_bp.route("/jobs/<job_id>", methods=["GET"])
+def report_job_status(job_id):
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+
+    if job["status"] == DONE and job["result_path"] and os.path.exists(job["result_path"]):
+        return send_file(
+            os.path.abspath(job["result_path"]),
+            as_attachment=True,
+            download_name=f"{job['report_id']}.pdf",
+            mimetype="application/pdf"
+        )
+
+    body = {
+        "job_id": job_id,
+        "status": job["status"],
+        "report_id": job["report_id"],
+    }
+    if "queue_position" in job:
+        body["queue_position"] = job["queue_position"]
+    if job["status"] == FAILED:
+        body["error"] = job["error"]
+    return jsonify(body), 200
+
+
+
+# ------------------ Audio Fingerprint Lookup ------------------
+@fingerprint_bp.route("/fingerprint", methods=["POST"])
+def fingerprint_lookup():
+    if "audio" not in request.files or request.files["audio"].filename == "":
+        return jsonify({"error": "Please provide an 'audio' file"}), 400
+    audio_file = request.files["audio"]
+    # Lookups leave the archive untouched unless archive=true
+    archive = request.form.get("archive", "false").lower() in ("1", "true", "yes")
+
+    try:
+        # Archive under the upload's own hash, not the preprocessed WAV's
+        upload_sha256 = hash_upload(audio_file)["hash_sha256"]
+        path = preprocess_audio(audio_file)
+        result = check_recording(path, name=secure_filename(audio_file.filename), archive=archive,
+                                 sha256=upload_sha256)
+        return jsonify(result), 200
+    except Exception as e:
+        return error_response(e)
+
+
+@fingerprint_bp.route("/fingerprint/<sha256>", methods=["DELETE"])
+def delete_fingerprint_endpoint(sha256):
+    if not fingerprint_index.remove(sha256.lower()):
+        return jsonify({"error": f"No archived recording with SHA-256 {sha256}"}), 404
+    return jsonify({"sha256": sha256.lower(), "removed": True}), 200
+
+
+# ------------------ Model Status ------------------
+@models_bp.route("/models", methods=["GET"])
+def model_status():
+    return jsonify(models.stats()), 200
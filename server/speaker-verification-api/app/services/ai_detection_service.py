@@ -1,42 +1,264 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
 import torch
-import torchaudio
 from transformers import AutoFeatureExtractor, AutoModelForAudioClassification
+from .. import config
+from ..utils.audio_buffer import load_audio
+from .result_cache import cached_result
+from .model_registry import models
+
+MODEL_NAME = "mo-thecreator/Deepfake-audio-detection"
+LABELS = ["synthetic", "real"]
+SAMPLE_RATE = 16000
+
+
+def _window_spans(n_samples, window, hop):
+    """(start, end) sample spans covering the signal; the last window is aligned to the end."""
+    if n_samples <= window:
+        return [(0, n_samples)]
+    starts = list(range(0, n_samples - window + 1, hop))
+    if starts[-1] + window < n_samples:
+        starts.append(n_samples - window)
+    return [(start, start + window) for start in starts]
+
+
+def _aggregate_windows(spans, synthetic_probs):
+    """Overall verdict plus a per-window timeline and merged synthetic regions."""
+    timeline = [
+        {
+            "start": round(start / SAMPLE_RATE, 2),
+            "end": round(end / SAMPLE_RATE, 2),
+            "synthetic_probability": round(prob, 4),
+        }
+        for (start, end), prob in zip(spans, synthetic_probs)
+    ]
+
+    segments = []
+    for entry in timeline:
+        if entry["synthetic_probability"] <= 0.5:
+            continue
+        if segments and entry["start"] <= segments[-1]["end"]:
+            segments[-1]["end"] = entry["end"]
+        else:
+            segments.append({"start": entry["start"], "end": entry["end"]})
+
+    mean_prob = sum(synthetic_probs) / len(synthetic_probs)
+    label = "synthetic" if mean_prob > 0.5 else "real"
+    return {
+        "label": label,
+        "score": mean_prob if label == "synthetic" else 1.0 - mean_prob,
+        "max_synthetic_probability": max(synthetic_probs),
+        "synthetic_window_fraction": sum(p > 0.5 for p in synthetic_probs) / len(synthetic_probs),
+        "synthetic_segments": segments,
+        "timeline": timeline,
+    }
+
 
 class VoiceDetector:
     def __init__(self):
-        model_name = "mo-thecreator/Deepfake-audio-detection"  # example model
-        
+        model_name = MODEL_NAME  # example model
+
         # Use AutoFeatureExtractor instead of AutoProcessor
         self.feature_extractor = AutoFeatureExtractor.from_pretrained(model_name)
         self.model = AutoModelForAudioClassification.from_pretrained(model_name)
 
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.model.to(self.device)
+        self.model.eval()
+
+    def predict_batch(self, speech_batch):
+        """
+        Classify several 16 kHz mono float arrays in one padded forward pass, or
+        one pass per input length if the feature extractor gives no attention mask.
+        Returns one {"label", "score"} dict per input, in order.
+        """
+        speech_batch = list(speech_batch)
+        if getattr(self.feature_extractor, "return_attention_mask", True):
+            return self._forward(speech_batch, use_attention_mask=True)
+
+        # Without an attention mask the model would hear the zero padding, so
+        # only inputs of exactly the same length share a forward pass
+        by_length = {}
+        for i, speech in enumerate(speech_batch):
+            by_length.setdefault(len(speech), []).append(i)
+        results = [None] * len(speech_batch)
+        for indices in by_length.values():
+            group = self._forward([speech_batch[i] for i in indices], use_attention_mask=False)
+            for i, result in zip(indices, group):
+                results[i] = result
+        return results
+
+    def _forward(self, speech_batch, use_attention_mask):
+        inputs = self.feature_extractor(
+            speech_batch,
+            sampling_rate=16000,
+            padding=True,
+            return_attention_mask=use_attention_mask,
+            return_tensors="pt"
+        )
+        input_values = inputs.input_values.to(self.device)
+        kwargs = {"attention_mask": inputs.attention_mask.to(self.device)} if use_attention_mask else {}
+
+        with torch.no_grad():
+            logits = self.model(input_values, **kwargs).logits
+
+        probs = torch.softmax(logits, dim=-1)
+        predicted = probs.argmax(-1)
+        return [
+            {
+                "label": LABELS[class_id],
+                "score": probs[i, class_id].item(),
+                "synthetic_probability": probs[i, 0].item(),
+            }
+            for i, class_id in enumerate(predicted.tolist())
+        ]
+
+    def score_windows(self, speech, window_s=config.DETECT_WINDOW_SECONDS, hop_s=config.DETECT_HOP_SECONDS,
+                      batch_size=config.DETECT_WINDOW_BATCH):
+        """
+        Sliding-window scoring for long recordings. Windows are fed through the
+        model batch_size at a time, so model memory is bounded by the window
+        batch rather than the recording length.
+        """
+        spans = _window_spans(len(speech), int(window_s * SAMPLE_RATE), int(hop_s * SAMPLE_RATE))
+        synthetic_probs = []
+        for i in range(0, len(spans), batch_size):
+            windows = [speech[start:end] for start, end in spans[i:i + batch_size]]
+            synthetic_probs += [r["synthetic_probability"] for r in self.predict_batch(windows)]
+        return _aggregate_windows(spans, synthetic_probs)
 
-    def is_synthetic(self, audio_file_path):
+    def is_synthetic(self, audio, windowed=None):
+        """
+        Accepts a file path or an already decoded DecodedAudio.
+        windowed=None switches to sliding-window scoring for long recordings.
+        """
         try:
-            # Load and resample audio
-            speech, rate = torchaudio.load(audio_file_path)
-            speech = torchaudio.functional.resample(speech, rate, 16000)
-            speech = speech.squeeze().numpy()
+            # Decoded once upstream at 16 kHz mono
+            speech = load_audio(audio).samples
+            if _use_windows(speech, windowed):
+                return self.score_windows(speech)
+            return self.predict_batch([speech])[0]
 
-            # Prepare input
-            inputs = self.feature_extractor(
-                speech,
-                sampling_rate=16000,
-                return_tensors="pt"
-            ).input_values.to(self.device)
+        except Exception as e:
+            return {"error": str(e)}
+
+
+def _use_windows(speech, windowed):
+    if windowed is None:
+        return len(speech) > config.DETECT_LONG_AUDIO_SECONDS * SAMPLE_RATE
+    return bool(windowed)
 
-            # Forward pass
-            with torch.no_grad():
-                logits = self.model(inputs).logits
 
-            predicted_class_id = logits.argmax(-1).item()
-            labels = ["synthetic", "real"]
-            predicted_label = labels[predicted_class_id]
-            score = torch.softmax(logits, dim=-1)[0][predicted_class_id].item()
+class BatchingVoiceDetector:
+    """
+    Micro-batching front end for a VoiceDetector shared by concurrent requests.
+    Callers block on is_synthetic(); a single worker thread waits up to
+    max_wait_ms for more requests, then runs them as one padded batch, bounded
+    by max_batch_size inputs and max_batch_samples padded samples.
+    """
 
-            return {"label": predicted_label, "score": score}
+    def __init__(self, detector, max_batch_size=config.DETECT_BATCH_MAX_SIZE,
+                 max_wait_ms=config.DETECT_BATCH_MAX_WAIT_MS,
+                 max_batch_samples=config.DETECT_BATCH_MAX_SAMPLES):
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_samples = max_batch_samples
+        self._queue = queue.Queue()
+        self._carry = None
+        self._start_lock = threading.Lock()
+        self._worker_pid = None
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so (re)start the worker in each process
+        if self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._carry = None
+                threading.Thread(target=self._worker_loop, name="deepfake-batcher", daemon=True).start()
+                self._worker_pid = os.getpid()
+
+    def _submit(self, speech):
+        future = Future()
+        self._queue.put((speech, future))
+        return future
+
+    def is_synthetic(self, audio, windowed=None):
+        """
+        Same contract as VoiceDetector.is_synthetic, but batched with other callers.
+        In windowed mode every window is queued as its own item, so windows from
+        one long recording are batched together (and with other requests).
+        """
+        try:
+            speech = load_audio(audio).samples
+            self._ensure_worker()
+            if not _use_windows(speech, windowed):
+                return self._submit(speech).result()
 
+            spans = _window_spans(
+                len(speech),
+                int(config.DETECT_WINDOW_SECONDS * SAMPLE_RATE),
+                int(config.DETECT_HOP_SECONDS * SAMPLE_RATE),
+            )
+            synthetic_probs = []
+            # Keep only a bounded number of windows in flight at a time
+            in_flight = config.DETECT_WINDOW_BATCH * 4
+            for i in range(0, len(spans), in_flight):
+                futures = [self._submit(speech[start:end]) for start, end in spans[i:i + in_flight]]
+                synthetic_probs += [f.result()["synthetic_probability"] for f in futures]
+            return _aggregate_windows(spans, synthetic_probs)
         except Exception as e:
             return {"error": str(e)}
+
+    def _next_batch(self):
+        first = self._carry if self._carry is not None else self._queue.get()
+        self._carry = None
+        batch = [first]
+        longest = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            padded = max(longest, len(item[0])) * (len(batch) + 1)
+            if padded > self.max_batch_samples:
+                self._carry = item  # would blow the padding budget; leads the next batch
+                break
+            batch.append(item)
+            longest = max(longest, len(item[0]))
+        return batch
+
+    def _worker_loop(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self.detector.predict_batch([speech for speech, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+
+models.register("deepfake", VoiceDetector)
+models.register("deepfake-batcher", lambda: BatchingVoiceDetector(models.get("deepfake")))
+
+
+@cached_result(f"detect:{MODEL_NAME}", version=2)
+def detect_synthetic(audio, windowed=None):
+    """
+    Run the shared, micro-batched VoiceDetector; the model is loaded on first call.
+    windowed=True forces a per-segment timeline, None enables it for long recordings.
+    """
+    return models.get("deepfake-batcher").is_synthetic(audio, windowed=windowed)
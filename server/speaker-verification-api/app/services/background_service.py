@@ -1,52 +1,199 @@
-import librosa
 import numpy as np
-import tempfile
+import librosa
+from scipy import ndimage
+from .. import config
+from ..utils.audio_buffer import load_audio
+from ..utils.spectral_features import features_for
+from .result_cache import cached_result
 
-def analyze_background_noise(file1, file2=None):
+
+def _band_starts(edges_hz, sr, n_fft):
+    """First STFT row of each band (DC excluded), with bands above Nyquist dropped."""
+    nyquist = sr / 2.0
+    edges = [e for e in edges_hz if e < nyquist]
+    starts = np.unique(np.maximum(1, np.ceil(np.asarray(edges) * n_fft / sr).astype(int)))
+    return starts, [float(e) for e in edges] + [nyquist]
+
+
+def _floor_track(power, sr, n_fft, hop_length):
     """
-    Analyze background noise consistency.
-    If one file: check internal consistency (different segments of same file).
-    If two files: compare mean noise levels between them.
+    Per-band noise floor (dBFS) every NOISE_STEP_SECONDS by minimum statistics:
+    band power is smoothed over a few frames, reduced to its minimum within each
+    step, then to the minimum over a centred NOISE_WINDOW_SECONDS window, which
+    tracks the level between speech bursts. Returns (floor_db, bin_counts,
+    step_seconds, half_window_steps, band_edges).
     """
+    starts, band_edges = _band_starts(config.NOISE_BAND_EDGES_HZ, sr, n_fft)
+    counts = np.diff(np.append(starts, power.shape[0]))
+    # Per-bin power of the Hann-windowed STFT divided by the window energy is the
+    # noise variance per sample, so band levels read as dBFS
+    window_energy = np.sum(librosa.filters.get_window("hann", n_fft, fftbins=True) ** 2)
+    band_power = np.add.reduceat(power, starts, axis=0) / (counts[:, None] * window_energy)
+    band_power = ndimage.uniform_filter1d(band_power, size=config.NOISE_SMOOTH_FRAMES, axis=1, mode="nearest")
 
-def get_noise_features(file_path):
+    # Frames -> steps: pad to whole steps with +inf and take each step's minimum
+    frames_per_step = max(1, int(round(config.NOISE_STEP_SECONDS * sr / hop_length)))
+    n_steps = -(-band_power.shape[1] // frames_per_step)
+    padded = np.full((len(starts), n_steps * frames_per_step), np.inf, dtype=band_power.dtype)
+    padded[:, :band_power.shape[1]] = band_power
+    step_min = padded.reshape(len(starts), n_steps, frames_per_step).min(axis=2)
+
+    step_seconds = frames_per_step * hop_length / sr
+    half = max(1, int(round(config.NOISE_WINDOW_SECONDS / step_seconds / 2)))
+    # An even size covers steps [t - half, t + half) around each step t
+    floor = ndimage.minimum_filter1d(step_min, size=2 * half, axis=1, mode="nearest")
+    return 10.0 * np.log10(np.maximum(floor, 1e-12)), counts, step_seconds, half, band_edges
+
+
+def _broadband_db(floor_db, counts):
+    """Bin-weighted power mean across bands, in dB."""
+    weights = counts[:, None] / counts.sum()
+    return 10.0 * np.log10(np.maximum(np.sum(weights * 10.0 ** (floor_db / 10.0), axis=0), 1e-12))
+
+
+def _splice_points(floor_db, step_seconds, half):
     """
-    Extract background noise features from an audio file.
-    Accepts a file path string.
+    Abrupt floor changes. Consecutive steps moving the same way are merged into one
+    change, located at its steepest step: a change at s moves the centred minimum
+    at t = s + half when the floor rises and at t = s - half when it falls. The
+    median jump across bands keeps narrow-band events from counting.
+    """
+    if floor_db.shape[1] < 2:
+        return []
+    jumps = np.median(np.diff(floor_db, axis=1), axis=0)
+    moving = np.where(np.abs(jumps) > config.NOISE_SPLICE_DB / 4, np.sign(jumps), 0)
+    runs = np.split(np.arange(len(jumps)), np.flatnonzero(np.diff(moving)) + 1)
+
+    points = []
+    for run in runs:
+        total = float(jumps[run].sum())
+        if moving[run[0]] == 0 or abs(total) <= config.NOISE_SPLICE_DB:
+            continue
+        t = run[np.argmax(np.abs(jumps[run]))]
+        step = t + 1 - half if total > 0 else t + half
+        points.append({"time_sec": round(max(step, 0) * step_seconds, 2), "jump_db": round(total, 2)})
+    if len(points) > config.NOISE_MAX_SPLICES:
+        points = sorted(sorted(points, key=lambda p: -abs(p["jump_db"]))[:config.NOISE_MAX_SPLICES],
+                        key=lambda p: p["time_sec"])
+    return points
+
+
+def _quiet_rms(rms):
+    """RMS of the quietest quarter of frames: the original mean_rms/variation/segments keys."""
+    noise = rms[rms < np.percentile(rms, 25)] if len(rms) else rms
+    return {
+        "mean_rms": float(np.mean(noise)) if len(noise) > 0 else 0,
+        "variation": float(np.std(noise)) if len(noise) > 0 else 0,
+        "segments": int(len(noise)),
+    }
+
+
+@cached_result("noise:profile", version=2)
+def noise_profile(file_path):
+    """
+    Time-resolved background-noise profile of a recording, from the STFT shared
+    with the other spectral analyses. Compact enough to cache per content hash:
+    the floor track is float16, bands x steps. Compare profiles with
+    compare_noise_profiles() without touching the audio again.
     """
+    audio = load_audio(file_path)
+    features = features_for(audio)
+    floor_db, counts, step_seconds, half, band_edges = _floor_track(
+        features.power, features.sr, features.n_fft, features.hop_length)
+    broadband = _broadband_db(floor_db, counts)
+
+    return {
+        "sample_rate": int(features.sr),
+        "step_seconds": float(step_seconds),
+        "band_edges_hz": band_edges,
+        "floor_track_db": floor_db.astype(np.float16),
+        "band_floor_db": [float(v) for v in np.median(floor_db, axis=1)],
+        "band_floor_std_db": [float(v) for v in np.std(floor_db, axis=1)],
+        "noise_floor_db": float(np.median(broadband)),
+        "noise_floor_variation_db": float(np.std(broadband)),
+        "splice_points": _splice_points(floor_db, step_seconds, half),
+        **_quiet_rms(features.rms),
+    }
+
+
+def _band_label(lo, hi):
+    return f"{lo:g}-{hi:g} Hz"
+
+
+def summarize_noise_profile(profile):
+    """JSON-friendly view of a noise profile (everything but the floor track)."""
+    edges = profile["band_edges_hz"]
+    return {
+        "mean_rms": profile["mean_rms"],
+        "variation": profile["variation"],
+        "segments": profile["segments"],
+        "noise_floor_db": round(profile["noise_floor_db"], 2),
+        "noise_floor_variation_db": round(profile["noise_floor_variation_db"], 2),
+        "band_floor_db": {
+            _band_label(lo, hi): round(v, 2)
+            for lo, hi, v in zip(edges[:-1], edges[1:], profile["band_floor_db"])
+        },
+        "splice_count": len(profile["splice_points"]),
+        "splice_points": profile["splice_points"],
+    }
+
+
+def compare_noise_profiles(profile1, profile2):
+    """
+    Compare two noise profiles: the broadband floor level and the shape of the
+    band floors (RMS of per-band differences once the level offset is removed).
+    """
+    level_diff = profile2["noise_floor_db"] - profile1["noise_floor_db"]
+    n = min(len(profile1["band_floor_db"]), len(profile2["band_floor_db"]))
+    band_diff = np.asarray(profile2["band_floor_db"][:n]) - np.asarray(profile1["band_floor_db"][:n])
+    shape_distance = float(np.sqrt(np.mean((band_diff - band_diff.mean()) ** 2))) if n else 0.0
+    return {
+        "floor_diff_db": round(float(level_diff), 2),
+        "band_floor_diff_db": [round(float(v), 2) for v in band_diff],
+        "shape_distance_db": round(shape_distance, 2),
+        "is_significant_diff": bool(abs(level_diff) > config.NOISE_LEVEL_DIFF_DB
+                                    or shape_distance > config.NOISE_SHAPE_DIFF_DB),
+    }
+
+
+def _safe_profile(file_path):
     try:
-        y, sr = librosa.load(file_path, sr=None)
-
-        # RMS energy
-        rms = librosa.feature.rms(y=y)[0]
-        # low-energy = background
-        noise = rms[rms < np.percentile(rms, 25)]
-
-        return {
-            "mean_rms": float(np.mean(noise)) if len(noise) > 0 else 0,
-            "variation": float(np.std(noise)) if len(noise) > 0 else 0,
-            "segments": int(len(noise)),
-        }
+        return noise_profile(file_path)
     except Exception as e:
         print(f"Error processing audio file {file_path}: {e}")
-        return {"mean_rms": 0, "variation": 0, "segments": 0}
+        return None
+
+
+def _features_of(profile):
+    if profile is None:
+        return {"mean_rms": 0, "variation": 0, "segments": 0,
+                "noise_floor_db": None, "noise_floor_variation_db": None,
+                "band_floor_db": {}, "splice_count": 0, "splice_points": []}
+    return summarize_noise_profile(profile)
+
+
+def get_noise_features(file_path):
+    """
+    Extract background noise features from an audio file.
+    Accepts a file path string or a DecodedAudio.
+    """
+    return _features_of(_safe_profile(file_path))
 
 
 def analyze_background_noise(file1, file2=None):
     """
     Analyze background noise features for one or two files.
-    Accepts file paths.
+    Accepts file paths or DecodedAudio objects; profiles are cached per content hash.
     """
-    f1 = get_noise_features(file1)
+    p1 = _safe_profile(file1)
+    f1 = _features_of(p1)
 
     if file2:  # Compare two files
-        f2 = get_noise_features(file2)
-        diff = abs(f1["mean_rms"] - f2["mean_rms"])
-        return {
-            "file1": f1,
-            "file2": f2,
-            "mean_rms_diff": diff,
-            "is_significant_diff": diff > 0.05,  # Example threshold
-        }
-
-    return {"file1_features": f1}
\ No newline at end of file
+        p2 = _safe_profile(file2)
+        f2 = _features_of(p2)
+        result = {"file1": f1, "file2": f2, "mean_rms_diff": abs(f1["mean_rms"] - f2["mean_rms"])}
+        if p1 is not None and p2 is not None:
+            result.update(compare_noise_profiles(p1, p2))
+        return result
+
+    return {"file1_features": f1}
@@ -0,0 +1,310 @@
+# app/services/embedding_store.py
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from .. import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS rows (id TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE);
+"""
+
+_DTYPES = {"float16": np.float16, "int8": np.int8}
+
+
+class _Snapshot:
+    """One consistent view of the store: memmapped rows plus the live row -> id mapping."""
+
+    def __init__(self, version=-1, removals=-1, vectors=None, scales=None, row_ids=None, live=None, row_of=None):
+        self.version = version
+        self.removals = removals
+        self.vectors = vectors
+        self.scales = scales
+        self.row_ids = row_ids if row_ids is not None else []
+        self.live = live if live is not None else np.zeros(0, dtype=bool)
+        self.row_of = row_of if row_of is not None else {}
+
+
+class EmbeddingStore:
+    """
+    Append-only matrix of unit-norm embeddings on disk, stored as float16, or
+    as int8 with one float32 scale per row, and opened with np.memmap. Every
+    process maps the same file, so the pages are shared through the OS page
+    cache rather than copied into each worker.
+
+    A SQLite table maps ids to rows and serialises writers across processes.
+    An append writes one row at the end of the file. Replacing an id appends a
+    new row, and removing an id only drops its mapping; the dead rows are
+    masked out when searching. Once compact_ratio of the rows are dead, the
+    live rows are rewritten into a new generation of files. Readers remap
+    when the version counter moves.
+    """
+
+    def __init__(self, store_dir=config.SPEAKER_INDEX_DIR, dtype=config.SPEAKER_INDEX_DTYPE,
+                 block_rows=config.SPEAKER_INDEX_BLOCK_ROWS, compact_ratio=config.SPEAKER_INDEX_COMPACT_RATIO):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Unsupported embedding dtype '{dtype}'")
+        self.store_dir = store_dir
+        self.block_rows = block_rows
+        self.compact_ratio = compact_ratio
+        self.db_path = os.path.join(store_dir, "rows.sqlite3")
+        self._lock = threading.Lock()
+        self._snapshot = _Snapshot()
+
+        os.makedirs(store_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('dtype', ?)", (dtype,))
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('rows', '0')")
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('version', '0')")
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('removals', '0')")
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('dead', '0')")
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('generation', '0')")
+            # An existing store keeps the dtype it was created with
+            self.dtype = conn.execute("SELECT value FROM meta WHERE key = 'dtype'").fetchone()[0]
+
+    @contextmanager
+    def _connect(self):
+        # A connection per operation: safe across gunicorn's fork
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _meta(conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _paths(self, generation):
+        """(vectors, scales) file paths of one generation of the store."""
+        suffix = f".{generation}" if generation else ""
+        return (os.path.join(self.store_dir, f"vectors{suffix}.bin"),
+                os.path.join(self.store_dir, f"scales{suffix}.bin"))
+
+    # ------------------ Writers ------------------
+    def _encode(self, embedding):
+        """Row bytes and scale for one embedding in the store's dtype."""
+        if self.dtype == "int8":
+            scale = float(np.max(np.abs(embedding))) / 127.0 or 1.0
+            return np.round(embedding / scale).astype(np.int8), scale
+        return embedding.astype(np.float16), 1.0
+
+    def _write_row(self, generation, row, data, scale):
+        vectors_path, scales_path = self._paths(generation)
+        with open(vectors_path, "ab") as f:
+            f.truncate(row * data.nbytes)  # drop bytes left by an append that never committed
+            f.write(data.tobytes())
+        if self.dtype == "int8":
+            with open(scales_path, "ab") as f:
+                f.truncate(row * 4)
+                f.write(np.float32(scale).tobytes())
+
+    def put(self, item_id, embedding):
+        """Append embedding (1-D, unit norm) under item_id, replacing any earlier row."""
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        data, scale = self._encode(embedding)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # one writer at a time across processes
+            try:
+                dim = self._meta(conn, "dim")
+                if dim is None:
+                    conn.execute("INSERT INTO meta VALUES ('dim', ?)", (str(len(embedding)),))
+                elif int(dim) != len(embedding):
+                    raise ValueError(f"Embedding has {len(embedding)} dimensions, the store holds {dim}")
+                row = int(self._meta(conn, "rows"))
+                self._write_row(int(self._meta(conn, "generation")), row, data, scale)
+                replaced = conn.execute("SELECT 1 FROM rows WHERE id = ?", (item_id,)).fetchone() is not None
+                conn.execute("INSERT OR REPLACE INTO rows (id, row) VALUES (?, ?)", (item_id, row))
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'rows'", (str(row + 1),))
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+                if replaced:
+                    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'dead'")
+                compact = self._needs_compaction(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if compact:
+            self.compact()
+
+    def remove(self, item_id):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = conn.execute("DELETE FROM rows WHERE id = ?", (item_id,)).rowcount > 0
+            if removed:
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key IN ('version', 'removals', 'dead')")
+            compact = removed and self._needs_compaction(conn)
+            conn.execute("COMMIT")
+        if compact:
+            self.compact()
+        return removed
+
+    def _needs_compaction(self, conn):
+        return int(self._meta(conn, "dead")) > self.compact_ratio * int(self._meta(conn, "rows"))
+
+    def compact(self):
+        """
+        Rewrite the live rows, in row order, into a new generation of files and
+        renumber the mapping; the old files are then deleted. Bumping removals
+        makes every reader reload the mapping, and a reader that still has the
+        old files mapped keeps a valid (if stale) view until then.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            generation = int(self._meta(conn, "generation"))
+            new_vectors, new_scales = self._paths(generation + 1)
+            try:
+                n_rows = int(self._meta(conn, "rows"))
+                dim = self._meta(conn, "dim")
+                mapping = conn.execute("SELECT row, id FROM rows ORDER BY row").fetchall()
+                rows = np.fromiter((row for row, _ in mapping), dtype=np.int64, count=len(mapping))
+
+                old_vectors, old_scales = self._paths(generation)
+                with open(new_vectors, "wb") as f:
+                    if len(rows):
+                        vectors = np.memmap(old_vectors, dtype=_DTYPES[self.dtype], mode="r",
+                                            shape=(n_rows, int(dim)))
+                        for start in range(0, len(rows), self.block_rows):
+                            f.write(np.ascontiguousarray(vectors[rows[start:start + self.block_rows]]).tobytes())
+                        del vectors
+                if self.dtype == "int8":
+                    with open(new_scales, "wb") as f:
+                        if len(rows):
+                            f.write(np.fromfile(old_scales, dtype=np.float32, count=n_rows)[rows].tobytes())
+
+                conn.execute("DELETE FROM rows")
+                conn.executemany("INSERT INTO rows (id, row) VALUES (?, ?)",
+                                 ((item_id, i) for i, (_, item_id) in enumerate(mapping)))
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'rows'", (str(len(mapping)),))
+                conn.execute("UPDATE meta SET value = '0' WHERE key = 'dead'")
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (str(generation + 1),))
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key IN ('version', 'removals')")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                for path in (new_vectors, new_scales):
+                    if os.path.exists(path):
+                        os.remove(path)
+                raise
+        for path in (old_vectors, old_scales):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # ------------------ Readers ------------------
+    def _current(self):
+        """
+        The latest snapshot, remapped only when another write has happened.
+        After appends only the new rows' ids are read; a removal or compaction
+        reloads the mapping. The previous snapshot is never modified, since
+        other threads may still be searching it.
+        """
+        with self._connect() as conn:
+            version = int(self._meta(conn, "version"))
+            if version == self._snapshot.version:
+                return self._snapshot
+            with self._lock:
+                old = self._snapshot
+                if version == old.version:
+                    return old
+                for attempt in range(3):
+                    try:
+                        self._snapshot = self._load(conn, old)
+                        return self._snapshot
+                    except FileNotFoundError:
+                        # Compacted between reading the mapping and opening its files
+                        if attempt == 2:
+                            raise
+
+    def _load(self, conn, old):
+        conn.execute("BEGIN")  # counters, dim and mapping from one transaction
+        version = int(self._meta(conn, "version"))
+        removals = int(self._meta(conn, "removals"))
+        n_rows = int(self._meta(conn, "rows"))
+        dim = self._meta(conn, "dim")
+        vectors_path, scales_path = self._paths(int(self._meta(conn, "generation")))
+        incremental = removals == old.removals
+        if incremental:
+            mapping = conn.execute("SELECT row, id FROM rows WHERE row >= ?", (len(old.live),)).fetchall()
+        else:
+            mapping = conn.execute("SELECT row, id FROM rows").fetchall()
+        conn.execute("COMMIT")
+
+        if incremental:
+            # Rows only ever get appended, so the old snapshot's rows stay valid
+            row_ids, row_of = list(old.row_ids), dict(old.row_of)
+            live = np.zeros(n_rows, dtype=bool)
+            live[:len(old.live)] = old.live
+            row_ids.extend([None] * (n_rows - len(row_ids)))
+        else:
+            row_ids, row_of = [None] * n_rows, {}
+            live = np.zeros(n_rows, dtype=bool)
+        for row, item_id in mapping:
+            replaced = row_of.get(item_id)
+            if replaced is not None:
+                live[replaced] = False
+            row_ids[row] = item_id
+            row_of[item_id] = row
+            live[row] = True
+
+        vectors = scales = None
+        if n_rows:
+            vectors = np.memmap(vectors_path, dtype=_DTYPES[self.dtype], mode="r", shape=(n_rows, int(dim)))
+            if self.dtype == "int8":
+                scales = np.memmap(scales_path, dtype=np.float32, mode="r", shape=(n_rows,))
+        return _Snapshot(version, removals, vectors, scales, row_ids, live, row_of)
+
+    def __len__(self):
+        return int(self._current().live.sum())
+
+    def ids(self):
+        snapshot = self._current()
+        return [snapshot.row_ids[row] for row in np.flatnonzero(snapshot.live)]
+
+    def __contains__(self, item_id):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM rows WHERE id = ?", (item_id,)).fetchone() is not None
+
+    def top_k(self, query, k):
+        """
+        (ids, scores) of the k live rows with the highest dot product with query,
+        best first. Rows are scored block_rows at a time, so only one block is
+        ever converted to float32.
+        """
+        snapshot = self._current()
+        if snapshot.vectors is None or k < 1:
+            return [], np.zeros(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32).ravel()
+
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for start in range(0, len(snapshot.live), self.block_rows):
+            stop = min(start + self.block_rows, len(snapshot.live))
+            live = snapshot.live[start:stop]
+            if not live.any():
+                continue
+            scores = snapshot.vectors[start:stop].astype(np.float32) @ query
+            if snapshot.scales is not None:
+                scores *= snapshot.scales[start:stop]
+            scores[~live] = -np.inf
+
+            rows = np.arange(start, stop)
+            if len(scores) > k:
+                keep = np.argpartition(-scores, k - 1)[:k]
+                rows, scores = rows[keep], scores[keep]
+            best_rows = np.concatenate([best_rows, rows])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        found = np.isfinite(best_scores)
+        best_rows, best_scores = best_rows[found], best_scores[found]
+        order = np.argsort(-best_scores)
+        return [snapshot.row_ids[row] for row in best_rows[order]], best_scores[order]
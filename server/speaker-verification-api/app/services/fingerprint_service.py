@@ -0,0 +1,205 @@
+# app/services/fingerprint_service.py
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from .. import config
+from ..utils.audio_buffer import load_audio
+from ..utils.fingerprint import find_peaks, landmark_hashes
+from ..utils.spectral_features import features_for
+from .result_cache import content_hash
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    name TEXT,
+    duration_sec REAL,
+    hash_count INTEGER NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    hash INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    t INTEGER NOT NULL,
+    PRIMARY KEY (hash, file_id, t)
+) WITHOUT ROWID;
+"""
+
+
+def fingerprint(audio):
+    """Landmark hashes of a DecodedAudio (or path) from its shared STFT: (hashes, anchor_frames, features)."""
+    features = features_for(load_audio(audio))
+    frames, bins = find_peaks(features.db, features.sr, features.hop_length)
+    hashes, anchor_frames = landmark_hashes(frames, bins)
+    return hashes, anchor_frames, features
+
+
+class FingerprintIndex:
+    """
+    Inverted index of landmark hashes in SQLite. The hashes table is clustered
+    on the hash, so a lookup is one B-tree probe per query hash and the cost
+    grows with the size of the query, not the archive.
+    """
+
+    def __init__(self, db_path=config.FINGERPRINT_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def add(self, sha256, hashes, anchor_frames, name=None, duration_sec=None):
+        """Archive one recording's hashes. Returns False if it is already archived."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO files (sha256, name, duration_sec, hash_count, added_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (sha256, name, duration_sec, len(hashes), time.time()),
+                )
+                if cursor.rowcount == 0:
+                    conn.execute("ROLLBACK")
+                    return False
+                file_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT OR IGNORE INTO hashes (hash, file_id, t) VALUES (?, ?, ?)",
+                    zip(hashes.tolist(), [file_id] * len(hashes), anchor_frames.tolist()),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def remove(self, sha256):
+        """Drop an archived recording and its hashes. Returns False if it was not archived."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id FROM files WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM hashes WHERE file_id = ?", (row[0],))
+                conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+            conn.execute("COMMIT")
+        return row is not None
+
+    def _postings(self, hashes, anchor_frames):
+        """(file_id, archive_frame, query_frame) for every archived occurrence of a query hash."""
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE query (hash INTEGER NOT NULL, t INTEGER NOT NULL)")
+            conn.executemany("INSERT INTO query VALUES (?, ?)", zip(hashes.tolist(), anchor_frames.tolist()))
+            rows = conn.execute(
+                "SELECT h.file_id, h.t, q.t FROM query q JOIN hashes h ON h.hash = q.hash"
+            ).fetchall()
+        return np.asarray(rows, dtype=np.int64).reshape(-1, 3)
+
+    def _files(self, file_ids):
+        with self._connect() as conn:
+            placeholders = ",".join("?" * len(file_ids))
+            rows = conn.execute(
+                f"SELECT id, sha256, name, duration_sec FROM files WHERE id IN ({placeholders})",
+                [int(i) for i in file_ids],
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def lookup(self, hashes, anchor_frames, seconds_per_frame, exclude_sha256=None,
+               min_matches=config.FINGERPRINT_MIN_MATCHES, max_matches=config.FINGERPRINT_MAX_MATCHES):
+        """
+        Archived recordings that share time-aligned landmarks with the query.
+        Hits are histogrammed by (file, archive frame - query frame); a copy shows
+        up as one dominant offset. Neighbouring offsets are pooled to absorb
+        one-frame jitter. Returns matches sorted by aligned hash count.
+        """
+        if len(hashes) == 0:
+            return []
+        postings = self._postings(hashes, anchor_frames)
+        if len(postings) == 0:
+            return []
+        file_ids, offsets = postings[:, 0], postings[:, 1] - postings[:, 2]
+
+        # Count hits per (file, offset); pool each offset with its neighbours
+        keys = (file_ids << 32) + (offsets + (1 << 31))
+        unique, counts = np.unique(keys, return_counts=True)
+        pooled = counts.copy()
+        for step in (-1, 1):
+            neighbour = np.searchsorted(unique, unique + step)
+            found = neighbour < len(unique)
+            found[found] = unique[neighbour[found]] == unique[found] + step
+            pooled[found] += counts[neighbour[found]]
+
+        # Best offset per file
+        by_file = unique >> 32
+        order = np.lexsort((-pooled, by_file))
+        first = order[np.r_[True, by_file[order][1:] != by_file[order][:-1]]]
+        first = first[pooled[first] >= min_matches]
+        if len(first) == 0:
+            return []
+        first = first[np.argsort(-pooled[first])][:max_matches + 1]  # +1 in case the query itself is archived
+
+        info = self._files(by_file[first])
+        matches = []
+        for idx in first:
+            file_id = int(by_file[idx])
+            sha256, name, duration_sec = info.get(file_id, (None, None, None))
+            if sha256 is None or sha256 == exclude_sha256:
+                continue
+            offset = int((unique[idx] & 0xFFFFFFFF) - (1 << 31))
+            aligned = (file_ids == file_id) & (np.abs(offsets - offset) <= 1)
+            query_frames = postings[aligned, 2]
+            matches.append({
+                "sha256": sha256,
+                "name": name,
+                "duration_sec": duration_sec,
+                "aligned_hashes": int(pooled[idx]),
+                "query_coverage": round(float(pooled[idx]) / len(hashes), 4),
+                "offset_sec": round(offset * seconds_per_frame, 3),
+                "query_start_sec": round(float(query_frames.min()) * seconds_per_frame, 2),
+                "query_end_sec": round(float(query_frames.max()) * seconds_per_frame, 2),
+            })
+        return matches[:max_matches]
+
+
+fingerprint_index = FingerprintIndex()
+
+
+def check_recording(audio, name=None, archive=False, sha256=None):
+    """
+    Look a recording up in the fingerprint archive and, with archive=True, add it.
+    offset_sec is where the query's start lines up in the matching archived file.
+    Accepts a file path or a DecodedAudio.
+    The archive is keyed by sha256: pass the SHA-256 of the original upload (and
+    its filename as name) so entries can be found and deleted by the hash users
+    know. Without it the key is the SHA-256 of the file passed in, which for a
+    preprocessed upload is the normalised WAV, not the upload.
+    """
+    audio = load_audio(audio)
+    hashes, anchor_frames, features = fingerprint(audio)
+    sha256 = sha256 or content_hash(audio)
+    matches = fingerprint_index.lookup(hashes, anchor_frames, features.hop_length / features.sr,
+                                       exclude_sha256=sha256)
+    archived = False
+    if archive:
+        archived = fingerprint_index.add(sha256, hashes, anchor_frames, name=name or audio.name,
+                                         duration_sec=round(audio.duration, 2))
+    return {
+        "sha256": sha256,
+        "hash_count": int(len(hashes)),
+        "matches": matches,
+        "archived": archived,
+    }
@@ -2,10 +2,12 @@
 import os
 from datetime import datetime
 import numpy as np
-import matplotlib.pyplot as plt
 import librosa
-import librosa.display
 import soundfile as sf
+from .. import config
+from ..utils.spectral_features import SpectralFeatures
+from ..utils.spectrogram_render import save_spectrogram
+from ..utils.streaming_stft import RunningStats, stream_power_frames, frame_count, power_to_db
 
 def load_audio_safe(file_path):
     """
@@ -17,16 +19,19 @@ def load_audio_safe(file_path):
         y = np.mean(y, axis=1)
     return y, sr
 
-def generate_spectrogram(file_path, save_dir='forensics_spectrograms'):
+def generate_spectrogram(file_path, save_dir='forensics_spectrograms', features=None):
     """
     Generate spectrogram image and return spectrogram matrix and audio data.
+    Pass the same SpectralFeatures to analyze_spectrogram to reuse this STFT.
     """
-    # Load audio safely
-    y, sr = load_audio_safe(file_path)
+    if features is None:
+        # Load audio safely
+        y, sr = load_audio_safe(file_path)
+        features = SpectralFeatures(y, sr, n_fft=2048, hop_length=512)
+    y, sr = features.y, features.sr
 
     # Compute STFT spectrogram
-    S = np.abs(librosa.stft(y, n_fft=2048, hop_length=512))
-    S_db = librosa.amplitude_to_db(S, ref=np.max)
+    S_db = features.db
 
     # Ensure save directory exists
     os.makedirs(save_dir, exist_ok=True)
@@ -34,20 +39,18 @@ def generate_spectrogram(file_path, save_dir='forensics_spectrograms'):
     img_path = os.path.join(save_dir, f"spectrogram_{timestamp}.png")
 
     # Plot spectrogram
-    plt.figure(figsize=(12, 6))
-    librosa.display.specshow(S_db, sr=sr, x_axis='time', y_axis='hz', cmap='magma')
-    plt.colorbar(format='%+2.0f dB')
-    plt.title('Forensic Spectrogram')
-    plt.tight_layout()
-    plt.savefig(img_path)
-    plt.close()
+    save_spectrogram(img_path, S_db, sr, hop_length=512, width=1200, height=600,
+                     y_axis='linear', title='Forensic Spectrogram')
 
     return S_db, sr, y, img_path
 
-def analyze_spectrogram(S_db, y, sr):
+def analyze_spectrogram(S_db, y, sr, features=None):
     """
     Deep forensic spectrogram analysis using frame-wise + band-wise metrics.
+    Flatness, entropy and mel bands all come from one STFT (features, if given).
     """
+    if features is None:
+        features = SpectralFeatures(y, sr, n_fft=2048, hop_length=512)
     analysis = {}
 
     # --- Frame-wise energy ---
@@ -57,9 +60,8 @@ def analyze_spectrogram(S_db, y, sr):
     
     # --- Silence detection per frame ---
     threshold = np.mean(S_db) - np.std(S_db)
-    silent_frames = np.sum(S_db < threshold)
-    total_frames = S_db.shape[1]
-    analysis['percent_silence'] = round((silent_frames / total_frames) * 100, 2)
+    silent_cells = np.sum(S_db < threshold)
+    analysis['percent_silence'] = round((silent_cells / S_db.size) * 100, 2)
 
     # --- Frequency spikes ---
     mean_freq = np.mean(S_db, axis=1)
@@ -76,26 +78,184 @@ def analyze_spectrogram(S_db, y, sr):
     analysis['num_abrupt_changes'] = int(abrupt_changes)
 
     # --- Frame-wise spectral flatness ---
-    flatness = librosa.feature.spectral_flatness(y=y, n_fft=2048, hop_length=512)
+    flatness = features.flatness
     analysis['spectral_flatness_mean'] = float(np.mean(flatness))
     analysis['spectral_flatness_std'] = float(np.std(flatness))
 
     # --- Spectral entropy per frame ---
-    ps = np.abs(librosa.stft(y, n_fft=2048, hop_length=512))**2
-    ps_norm = ps / (np.sum(ps, axis=0, keepdims=True) + 1e-8)
-    entropy = -np.sum(ps_norm * np.log2(ps_norm + 1e-8), axis=0)
+    entropy = features.entropy
     analysis['spectral_entropy_mean'] = float(np.mean(entropy))
     analysis['spectral_entropy_std'] = float(np.std(entropy))
 
     # --- Mel-band variance (low/mid/high) ---
-    S_mel = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=40)
-    S_mel_db = librosa.power_to_db(S_mel, ref=np.max)
+    S_mel_db = features.mel_db
     analysis['mel_low_var'] = float(np.var(S_mel_db[:10, :]))
     analysis['mel_mid_var'] = float(np.var(S_mel_db[10:30, :]))
     analysis['mel_high_var'] = float(np.var(S_mel_db[30:, :]))
 
     return analysis
 
+def analyze_spectrogram_stream(file_path, save_dir='forensics_spectrograms', n_fft=2048, hop_length=512,
+                               block_frames=config.STREAM_STFT_BLOCK_FRAMES, image_width=1200):
+    """
+    Streaming version of generate_spectrogram + analyze_spectrogram for long recordings.
+    The file is read in blocks and the STFT is never held in full: pass one finds
+    the peak power (the dB reference), pass two accumulates every metric with
+    online statistics. Memory is a few STFT blocks, a spectrogram pooled to
+    image_width columns and one float per frame for the abrupt-change count.
+    Silence uses a 0.01 dB histogram of the dB values.
+    Returns the analyze_spectrogram keys plus 'spectrogram_image'.
+    """
+    sr = sf.info(file_path).samplerate
+    n_frames = frame_count(file_path, hop_length)
+    if n_frames == 0:
+        raise ValueError(f"No audio frames in {file_path}")
+    n_bins = 1 + n_fft // 2
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=40).astype(np.float32)
+
+    # Pass 1: dB references (librosa's ref=np.max) for the STFT and the mel spectrogram
+    max_power = max_mel = 0.0
+    for power in stream_power_frames(file_path, n_fft, hop_length, block_frames):
+        max_power = max(max_power, float(power.max()))
+        max_mel = max(max_mel, float((mel_basis @ power).max()))
+
+    # Pass 2: accumulate
+    db_stats, energy_stats, diff_stats = RunningStats(), RunningStats(), RunningStats()
+    low_stats, flat_stats, entropy_stats = RunningStats(), RunningStats(), RunningStats()
+    mel_stats = [RunningStats(), RunningStats(), RunningStats()]
+    bin_sum = np.zeros(n_bins)
+    histogram = np.zeros(8001, dtype=np.int64)  # -80 .. 0 dB in 0.01 dB steps
+    frame_energy = np.empty(n_frames, dtype=np.float32)
+    low_rows = int(500 * n_bins / sr)
+    pooled = np.full((n_bins, min(image_width, n_frames)), -80.0, dtype=np.float32)
+    column_of = np.arange(n_frames) * pooled.shape[1] // n_frames
+
+    done = 0
+    for power in stream_power_frames(file_path, n_fft, hop_length, block_frames):
+        k = power.shape[1]
+        S_db = power_to_db(power, max_power)
+        db_stats.update(S_db)
+        histogram += np.bincount(np.round((S_db.ravel() + 80.0) * 100).astype(np.int64), minlength=8001)[:8001]
+        bin_sum += S_db.sum(axis=1)
+        low_stats.update(S_db[:low_rows])
+
+        energy = np.sum(S_db ** 2, axis=0)
+        energy_stats.update(energy)
+        frame_energy[done:done + k] = energy
+        if done:
+            diff_stats.update(np.diff(frame_energy[done - 1:done + k]))
+        else:
+            diff_stats.update(np.diff(energy))
+
+        # Same formulas as SpectralFeatures.flatness / .entropy
+        clipped = np.maximum(power, 1e-10)
+        flat_stats.update(np.exp(np.mean(np.log(clipped), axis=0)) / np.mean(clipped, axis=0))
+        ps_norm = power / (np.sum(power, axis=0, keepdims=True) + 1e-8)
+        entropy_stats.update(-np.sum(ps_norm * np.log2(ps_norm + 1e-8), axis=0))
+
+        mel_db = power_to_db(mel_basis @ power, max_mel)
+        for stats, rows in zip(mel_stats, (slice(0, 10), slice(10, 30), slice(30, None))):
+            stats.update(mel_db[rows])
+
+        np.maximum.at(pooled.T, column_of[done:done + k], S_db.T)
+        done += k
+
+    analysis = {}
+    analysis['average_energy'] = float(energy_stats.mean)
+    analysis['energy_std'] = float(energy_stats.std)
+
+    threshold = float(db_stats.mean - db_stats.std)
+    silent_cells = int(histogram[:max(0, int(np.ceil((threshold + 80.0) * 100)))].sum())
+    analysis['percent_silence'] = round((silent_cells / histogram.sum()) * 100, 2)
+
+    mean_freq = bin_sum / max(done, 1)
+    spikes = np.where(mean_freq > np.mean(mean_freq) + 3*np.std(mean_freq))[0]
+    analysis['num_frequency_spikes'] = int(len(spikes))
+
+    analysis['low_freq_variance'] = float(low_stats.var)
+    frame_diff = np.diff(frame_energy[:done])
+    analysis['num_abrupt_changes'] = int(np.sum(np.abs(frame_diff) > 2*diff_stats.std))
+    analysis['spectral_flatness_mean'] = float(flat_stats.mean)
+    analysis['spectral_flatness_std'] = float(flat_stats.std)
+    analysis['spectral_entropy_mean'] = float(entropy_stats.mean)
+    analysis['spectral_entropy_std'] = float(entropy_stats.std)
+    analysis['mel_low_var'] = float(mel_stats[0].var)
+    analysis['mel_mid_var'] = float(mel_stats[1].var)
+    analysis['mel_high_var'] = float(mel_stats[2].var)
+
+    analysis['spectrogram_image'] = _save_pooled(pooled, sr, hop_length * n_frames / pooled.shape[1], save_dir)
+
+    return analysis
+
+def _save_pooled(pooled, sr, hop_length, save_dir):
+    """Write a pooled spectrogram to save_dir/spectrogram_<timestamp>.png and return the path."""
+    os.makedirs(save_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    img_path = os.path.join(save_dir, f"spectrogram_{timestamp}.png")
+    save_spectrogram(img_path, pooled, sr, hop_length=hop_length,
+                     width=1200, height=600, y_axis='linear', title='Forensic Spectrogram')
+    return img_path
+
+def analyze_forensic_spectrogram_stream(file_path, save_dir='forensics_spectrograms', n_fft=2048, hop_length=512,
+                                        block_frames=config.STREAM_STFT_BLOCK_FRAMES, image_width=1200):
+    """
+    The /analyze_forensic spectrogram metrics, streamed like analyze_spectrogram_stream.
+    These keep that route's own definitions: fixed thresholds (silence below -50 dB,
+    abrupt change above 5 in frame energy) and a 0-2000 Hz low band. The silence
+    share, percent_silence_spectro, is taken over time-frequency cells.
+    Returns the metrics plus 'spectrogram_image'.
+    """
+    sr = sf.info(file_path).samplerate
+    n_frames = frame_count(file_path, hop_length)
+    if n_frames == 0:
+        raise ValueError(f"No audio frames in {file_path}")
+    n_bins = 1 + n_fft // 2
+
+    # Pass 1: dB reference (ref=np.max)
+    max_power = 0.0
+    for power in stream_power_frames(file_path, n_fft, hop_length, block_frames):
+        max_power = max(max_power, float(power.max()))
+
+    # Pass 2: accumulate
+    energy_stats, low_stats = RunningStats(), RunningStats()
+    bin_sum = np.zeros(n_bins)
+    silent_cells = abrupt_changes = 0
+    last_energy = None
+    low_rows = int(2000 * n_bins / sr)
+    pooled = np.full((n_bins, min(image_width, n_frames)), -80.0, dtype=np.float32)
+    column_of = np.arange(n_frames) * pooled.shape[1] // n_frames
+
+    done = 0
+    for power in stream_power_frames(file_path, n_fft, hop_length, block_frames):
+        k = power.shape[1]
+        S_db = power_to_db(power, max_power)
+        silent_cells += int(np.sum(S_db < -50))
+        bin_sum += S_db.sum(axis=1)
+        low_stats.update(S_db[:low_rows])
+
+        energy = np.sum(S_db ** 2, axis=0)
+        energy_stats.update(energy)
+        if last_energy is not None:
+            energy = np.concatenate(([last_energy], energy))
+        abrupt_changes += int(np.sum(np.abs(np.diff(energy)) > 5))
+        last_energy = energy[-1]
+
+        np.maximum.at(pooled.T, column_of[done:done + k], S_db.T)
+        done += k
+
+    mean_freq = bin_sum / done
+    spikes = np.where(mean_freq > np.mean(mean_freq) + 3*np.std(mean_freq))[0]
+
+    return {
+        'average_energy': float(energy_stats.mean),
+        'energy_std': float(energy_stats.std),
+        'percent_silence_spectro': round((silent_cells / (n_bins * done)) * 100, 2),
+        'num_frequency_spikes': int(len(spikes)),
+        'low_freq_variance': float(low_stats.var),
+        'num_abrupt_changes': int(abrupt_changes),
+        'spectrogram_image': _save_pooled(pooled, sr, hop_length * n_frames / pooled.shape[1], save_dir),
+    }
+
 def generate_forensic_report(metrics):
     """
     Generate police-style forensic report from deep metrics.
@@ -2,7 +2,8 @@
 import hashlib
 
 def compute_file_hashes(file_path: str):
-    """Compute SHA256 and MD5 hashes for a given file."""
+    """Compute SHA256 and MD5 hashes for a given file (or a DecodedAudio's source file)."""
+    file_path = getattr(file_path, "source_path", file_path)
     sha256_hash = hashlib.sha256()
     md5_hash = hashlib.md5()
 
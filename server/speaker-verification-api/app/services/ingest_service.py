@@ -0,0 +1,170 @@
+# app/services/ingest_service.py
+import hashlib
+import os
+import shutil
+import tempfile
+from flask import Request, jsonify
+from werkzeug.utils import secure_filename
+
+from .. import config
+from ..utils.workspace import request_workspace
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds config.MAX_UPLOAD_BYTES; create_app() answers it with 413."""
+
+
+def error_response(e, message=None):
+    """
+    JSON 500 for an exception caught by a route. UploadTooLargeError is re-raised
+    so the app-level handler turns it into a 413.
+    """
+    if isinstance(e, UploadTooLargeError):
+        raise e
+    return jsonify({"error": message or str(e)}), 500
+
+
+class IngestedUpload:
+    """An upload streamed to disk, with the hashes computed while it was written."""
+
+    def __init__(self, path, filename, size, hash_sha256, hash_md5):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.hash_sha256 = hash_sha256
+        self.hash_md5 = hash_md5
+
+    def hashes(self):
+        """Same shape as hash_service.compute_file_hashes."""
+        return {"hash_sha256": self.hash_sha256, "hash_md5": self.hash_md5}
+
+
+def _too_large(filename, max_bytes):
+    return UploadTooLargeError(f"Upload '{filename}' exceeds the {max_bytes // (1024 * 1024)} MB limit")
+
+
+class HashingSpool:
+    """
+    Writable temp file in the request workspace that werkzeug spools a multipart
+    file part into. SHA-256/MD5 are updated and the per-file limit is enforced on
+    every write, so an oversized upload is rejected while the form is parsed and
+    ingest_upload() can move the file instead of reading it back.
+    """
+
+    def __init__(self, filename, max_bytes=config.MAX_UPLOAD_BYTES):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._md5 = hashlib.md5()
+        self._file = tempfile.NamedTemporaryFile(prefix="spool_", dir=request_workspace().path, delete=False)
+        self.name = self._file.name
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise _too_large(self.filename, self.max_bytes)
+        self._sha256.update(data)
+        self._md5.update(data)
+        return self._file.write(data)
+
+    def hashes(self):
+        return {"hash_sha256": self._sha256.hexdigest(), "hash_md5": self._md5.hexdigest()}
+
+    def __getattr__(self, name):
+        # read/seek/close/... go to the underlying file
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class IngestRequest(Request):
+    """Flask request class whose multipart file parts are spooled through HashingSpool."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if content_length is not None and content_length > config.MAX_UPLOAD_BYTES:
+            raise _too_large(filename, config.MAX_UPLOAD_BYTES)
+        return HashingSpool(filename, config.MAX_UPLOAD_BYTES)
+
+
+def _spool(file, max_bytes):
+    """The upload's HashingSpool if it can be used as-is, else None."""
+    stream = getattr(file, "stream", None)
+    if isinstance(stream, HashingSpool) and not stream.closed and stream.max_bytes <= max_bytes:
+        return stream
+    return None
+
+
+def _read_chunks(file, max_bytes, chunk_size):
+    """Yield the upload body in chunk_size pieces, enforcing max_bytes as it goes."""
+    stream = file.stream
+    if hasattr(stream, "seek"):
+        stream.seek(0)
+    size = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        size += len(chunk)
+        if size > max_bytes:
+            raise _too_large(file.filename, max_bytes)
+        yield chunk
+
+
+def hash_upload(file, max_bytes=config.MAX_UPLOAD_BYTES, chunk_size=config.INGEST_CHUNK_SIZE):
+    """Hashes of an upload; taken from its HashingSpool when werkzeug spooled it through one."""
+    spool = _spool(file, max_bytes)
+    if spool is not None:
+        return spool.hashes()
+    sha256_hash = hashlib.sha256()
+    md5_hash = hashlib.md5()
+    for chunk in _read_chunks(file, max_bytes, chunk_size):
+        sha256_hash.update(chunk)
+        md5_hash.update(chunk)
+    return {"hash_sha256": sha256_hash.hexdigest(), "hash_md5": md5_hash.hexdigest()}
+
+
+def ingest_upload(file, output_dir=config.UPLOAD_FOLDER, max_bytes=config.MAX_UPLOAD_BYTES,
+                  chunk_size=config.INGEST_CHUNK_SIZE):
+    """
+    Store a FileStorage as a uniquely named file in output_dir. A HashingSpool
+    (see IngestRequest) already holds the bytes and hashes, so it is moved into
+    place. Any other stream is copied in large chunks, updating SHA-256/MD5 as
+    each chunk is written. Either way memory use is one chunk, whatever the
+    upload size. The spooled file is consumed, so ingest an upload only once.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    filename = secure_filename(file.filename) or "upload"
+    suffix = os.path.splitext(filename)[1]
+
+    spool = _spool(file, max_bytes)
+    if spool is not None:
+        fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=output_dir)
+        os.close(fd)
+        spool.close()
+        try:
+            shutil.move(spool.name, path)  # a rename unless output_dir is on another filesystem
+        except BaseException:
+            os.remove(path)
+            raise
+        hashes = spool.hashes()
+        return IngestedUpload(path, filename, spool.size, hashes["hash_sha256"], hashes["hash_md5"])
+
+    sha256_hash = hashlib.sha256()
+    md5_hash = hashlib.md5()
+    size = 0
+
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=output_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in _read_chunks(file, max_bytes, chunk_size):
+                size += len(chunk)
+                sha256_hash.update(chunk)
+                md5_hash.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return IngestedUpload(path, filename, size, sha256_hash.hexdigest(), md5_hash.hexdigest())
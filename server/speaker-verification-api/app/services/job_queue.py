@@ -0,0 +1,270 @@
+# app/services/job_queue.py
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from .. import config
+from .report_service import generate_pdf_report, preprocess_audio
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    report_id TEXT NOT NULL,
+    original_path TEXT,
+    suspected_path TEXT,
+    result_path TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+_EXPIRE_EVERY = 60.0  # seconds between sweeps for expired jobs
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds the maximum number of unfinished jobs."""
+
+
+class JobQueue:
+    """
+    Bounded, SQLite-backed queue of report jobs.
+    Uploads and finished PDFs live in one directory per job, so queued work
+    survives a restart and several worker processes can share the same queue.
+    Uploads are deleted once a job finishes; finished jobs and their PDFs are
+    deleted result_ttl seconds later.
+    """
+
+    def __init__(self, db_path=config.JOB_DB_PATH, jobs_dir=config.JOB_FOLDER,
+                 max_pending=config.JOB_MAX_PENDING, workers=config.JOB_WORKERS,
+                 poll_interval=config.JOB_POLL_INTERVAL, result_ttl=config.JOB_RESULT_TTL):
+        self.db_path = db_path
+        self.jobs_dir = jobs_dir
+        self.max_pending = max_pending
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._next_expiry = 0.0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        os.makedirs(jobs_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # ------------------ Producer side ------------------
+    def submit_report(self, original_file, suspected_file):
+        """Persist both uploads and enqueue a report job. Returns the job id."""
+        # Cheap early rejection; the binding check is made again with the insert
+        if self.pending_count() >= self.max_pending:
+            raise QueueFullError(f"Report queue is full ({self.max_pending} jobs pending)")
+
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        try:
+            original_path = preprocess_audio(original_file, output_dir=os.path.join(job_dir, "original"))
+            suspected_path = preprocess_audio(suspected_file, output_dir=os.path.join(job_dir, "suspected"))
+
+            report_id = f"REP-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            with self._connect() as conn:
+                # Count and insert in one write transaction, so concurrent
+                # submissions from any process cannot overshoot max_pending
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    pending = conn.execute(
+                        "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+                    ).fetchone()[0]
+                    if pending >= self.max_pending:
+                        raise QueueFullError(f"Report queue is full ({self.max_pending} jobs pending)")
+                    conn.execute(
+                        "INSERT INTO jobs (id, kind, status, report_id, original_path, suspected_path, created_at) "
+                        "VALUES (?, 'report', ?, ?, ?, ?, ?)",
+                        (job_id, QUEUED, report_id, original_path, suspected_path, time.time()),
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        except Exception:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+
+        self._wakeup.set()
+        return job_id
+
+    def pending_count(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()
+        return row[0]
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job["status"] == QUEUED:
+            with self._connect() as conn:
+                job["queue_position"] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at <= ?",
+                    (QUEUED, job["created_at"]),
+                ).fetchone()[0]
+        return job
+
+    # ------------------ Consumer side ------------------
+    def _claim_next(self):
+        """Atomically move the oldest queued job to running and return it."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id, report_id, original_path, suspected_path FROM jobs "
+                    "WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (QUEUED,),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, worker_pid = ? WHERE id = ?",
+                        (RUNNING, time.time(), os.getpid(), row[0]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _finish(self, job_id, status, result_path=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result_path = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result_path, error, time.time(), job_id),
+            )
+
+    def run_one(self):
+        """Process a single queued job. Returns False when the queue is empty."""
+        job = self._claim_next()
+        if job is None:
+            return False
+
+        job_id, report_id, original_path, suspected_path = job
+        try:
+            pdf_buffer = generate_pdf_report(original_path, suspected_path, report_id)
+            result_path = os.path.join(self.jobs_dir, job_id, f"{report_id}.pdf")
+            with open(result_path, "wb") as f:
+                f.write(pdf_buffer.getbuffer())
+            self._finish(job_id, DONE, result_path=result_path)
+        except Exception as e:
+            print(f"Report job {job_id} failed: {e}")
+            self._finish(job_id, FAILED, error=str(e))
+        finally:
+            # Only the PDF outlives the job
+            for name in ("original", "suspected"):
+                shutil.rmtree(os.path.join(self.jobs_dir, job_id, name), ignore_errors=True)
+        return True
+
+    def expire(self, now=None):
+        """Delete finished jobs older than result_ttl, with their PDFs. Returns how many."""
+        cutoff = (time.time() if now is None else now) - self.result_ttl
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = [row[0] for row in conn.execute(
+                    "SELECT id FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff)
+                )]
+                conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        for job_id in expired:
+            shutil.rmtree(os.path.join(self.jobs_dir, job_id), ignore_errors=True)
+        return len(expired)
+
+    def _worker_loop(self):
+        while True:
+            try:
+                if self.run_one():
+                    continue
+                if time.time() >= self._next_expiry:
+                    self._next_expiry = time.time() + _EXPIRE_EVERY
+                    self.expire()
+            except Exception as e:
+                print(f"Report worker error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def recover(self):
+        """
+        Requeue jobs left running by a worker process that no longer exists.
+        Jobs whose uploads are gone (already consumed by the report builder)
+        are marked failed instead.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, original_path, suspected_path, worker_pid FROM jobs WHERE status = ?", (RUNNING,)
+            ).fetchall()
+            for job_id, original_path, suspected_path, worker_pid in rows:
+                if worker_pid and _pid_alive(worker_pid) and worker_pid != os.getpid():
+                    continue
+                if os.path.exists(original_path) and os.path.exists(suspected_path):
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, started_at = NULL, worker_pid = NULL WHERE id = ?",
+                        (QUEUED, job_id),
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                        (FAILED, "Interrupted by a server restart", time.time(), job_id),
+                    )
+
+    def start(self, workers=None):
+        """Start background worker threads in this process."""
+        if self._threads:
+            return
+        self.recover()
+        for i in range(self.workers if workers is None else workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"report-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def run_forever(self, workers=None):
+        """Run workers in the foreground, for a dedicated worker process."""
+        self.start(workers or max(self.workers, 1))
+        for thread in self._threads:
+            thread.join()
+
+
+report_jobs = JobQueue()
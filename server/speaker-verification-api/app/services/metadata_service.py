@@ -0,0 +1,263 @@
+# app/services/metadata_service.py
+import hashlib
+import os
+
+import numpy as np
+import soundfile as sf
+
+from .. import config
+from ..utils.audio_converter import _ffmpeg_decode
+from ..utils.streaming_stft import RunningStats
+
+SILENCE_THRESHOLD = 1e-4  # absolute sample level treated as digital silence
+
+# MPEG audio frame header tables, indexed [version][layer] / [version]
+_MPEG_BITRATES_KBPS = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MPEG_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 25: (11025, 12000, 8000)}
+
+
+def _parse_mpeg_header(buf, pos):
+    """(frame_length_bytes, duration_seconds, bitrate_bps) of the MPEG audio frame at pos, or None."""
+    b0, b1, b2 = buf[pos], buf[pos + 1], buf[pos + 2]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = {3: 1, 2: 2, 0: 25}.get((b1 >> 3) & 3)
+    layer = {3: 1, 2: 2, 1: 3}.get((b1 >> 1) & 3)
+    bitrate_index = (b2 >> 4) & 0xF
+    rate_index = (b2 >> 2) & 3
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _MPEG_BITRATES_KBPS[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _MPEG_SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    if layer == 1:
+        samples, length = 384, (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 576 if (layer == 3 and version != 1) else 1152
+        length = samples // 8 * bitrate // sample_rate + padding
+    return length, samples / sample_rate, bitrate
+
+
+class _MpegFrameScanner:
+    """
+    Walks MPEG audio frame headers in a byte stream fed chunk by chunk and
+    totals the compressed bytes that fall in each second of audio.
+    Jumps frame to frame, so only headers are inspected.
+    """
+
+    def __init__(self):
+        self._pending = b""
+        self._skip = 0
+        self._started = False
+        self.time = 0.0
+        self.frames = 0
+        self.bytes_per_second = []
+
+    def _record(self, length, duration):
+        second = int(self.time)
+        if second >= len(self.bytes_per_second):
+            self.bytes_per_second.extend([0] * (second + 1 - len(self.bytes_per_second)))
+        self.bytes_per_second[second] += length
+        self.time += duration
+        self.frames += 1
+
+    def feed(self, data):
+        if self._skip:
+            dropped = min(self._skip, len(data))
+            self._skip -= dropped
+            data = data[dropped:]
+        buf = self._pending + bytes(data)
+        pos = 0
+        if not self._started:
+            if len(buf) < 10:
+                self._pending = buf  # wait for a whole ID3v2 header
+                return
+            self._started = True
+            if buf[:3] == b"ID3":  # ID3v2 tag: syncsafe size, optional footer
+                size = (buf[6] << 21) | (buf[7] << 14) | (buf[8] << 7) | buf[9]
+                pos = 10 + size + (10 if buf[5] & 0x10 else 0)
+                if pos > len(buf):
+                    # The tag (e.g. embedded cover art) runs past this chunk
+                    self._skip = pos - len(buf)
+                    self._pending = b""
+                    return
+        while pos + 4 <= len(buf):
+            frame = _parse_mpeg_header(buf, pos)
+            if frame is None:
+                pos += 1  # resync
+                continue
+            length, duration, _ = frame
+            self._record(length, duration)
+            if pos + length > len(buf):
+                self._skip = pos + length - len(buf)
+                pos = len(buf)
+                break
+            pos += length
+        self._pending = buf[pos:] if pos < len(buf) else b""
+
+
+def _looks_like_mpeg(head):
+    return head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0)
+
+
+class _TeeReader:
+    """
+    File wrapper handed to soundfile. Every byte the decoder reads is passed on
+    once, in file order, to the hashes (and the MPEG frame scanner), so hashing,
+    header parsing and decoding share a single read of the file. Header seeks
+    back are not re-hashed; ranges the decoder skips are read when jumped over.
+    """
+
+    def __init__(self, f, chunk_size):
+        self._f = f
+        self._chunk_size = chunk_size
+        self.hashed = 0
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.mpeg = None
+
+    def _consume(self, data):
+        if self.hashed == 0 and self.mpeg is None and _looks_like_mpeg(bytes(data[:4])):
+            self.mpeg = _MpegFrameScanner()
+        self.md5.update(data)
+        self.sha256.update(data)
+        if self.mpeg is not None:
+            self.mpeg.feed(data)
+        self.hashed += len(data)
+
+    def _fill_to(self, offset):
+        """Pass on bytes [hashed, offset) that the decoder jumped over."""
+        here = self._f.tell()
+        self._f.seek(self.hashed)
+        while self.hashed < offset:
+            data = self._f.read(min(self._chunk_size, offset - self.hashed))
+            if not data:
+                break
+            self._consume(data)
+        self._f.seek(here)
+
+    def readinto(self, buffer):
+        start = self._f.tell()
+        if start > self.hashed:
+            self._fill_to(start)
+        n = self._f.readinto(buffer)
+        end = start + n
+        if end > self.hashed:
+            self._consume(memoryview(buffer)[self.hashed - start:n])
+        return n
+
+    def read(self, size=-1):
+        start = self._f.tell()
+        if start > self.hashed:
+            self._fill_to(start)
+        data = self._f.read(size)
+        end = start + len(data)
+        if end > self.hashed:
+            self._consume(data[self.hashed - start:])
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._f.seek(offset, whence)
+
+    def tell(self):
+        return self._f.tell()
+
+    def finish(self):
+        """Pass on whatever the decoder never read (trailing tags etc.)."""
+        self._f.seek(self.hashed)
+        while True:
+            data = self._f.read(self._chunk_size)
+            if not data:
+                break
+            self._consume(data)
+
+
+def _rate_stats(bytes_per_second):
+    """Average/variance of per-second bitrates (bits); the partial last second is dropped."""
+    full = bytes_per_second[:-1] if len(bytes_per_second) > 1 else bytes_per_second
+    stats = RunningStats()
+    stats.update(np.asarray(full, dtype=np.float64) * 8)
+    if not stats.count:
+        return None, None, None
+    avg, var = float(stats.mean), float(stats.var)
+    return avg, var, (var / (avg ** 2) if avg else 0.0)
+
+
+def extract_audio_metadata(file_path, chunk_size=config.INGEST_CHUNK_SIZE):
+    """
+    Forensic metadata from one sequential read of file_path: MD5/SHA-256,
+    duration, sample rate, channels, digital-silence ratio and per-second
+    bitrate statistics. MP3 bitrates come from the MPEG frame headers; for
+    other formats they come from how many file bytes each decoded second consumed,
+    and are None when the decoder reads the whole file before decoding (Ogg Vorbis).
+    Files libsndfile cannot decode are still hashed in the same read, then
+    decoded through ffmpeg.
+    """
+    file_size = os.path.getsize(file_path)
+    bytes_per_second = []
+    silent = total = frames = 0
+    sample_rate = channels = None
+    audio_format = subtype = None
+
+    with open(file_path, "rb") as f:
+        reader = _TeeReader(f, chunk_size)
+        try:
+            with sf.SoundFile(reader) as audio:
+                sample_rate, channels = audio.samplerate, audio.channels
+                audio_format, subtype = audio.format, audio.subtype
+                position = reader.hashed
+                # Some decoders (e.g. Ogg Vorbis) read the whole file while opening it;
+                # then stream positions say nothing about per-second bitrate
+                tracks_position = position < file_size
+                for block in audio.blocks(blocksize=sample_rate, dtype="float32", always_2d=True):
+                    frames += len(block)
+                    silent += int(np.count_nonzero(np.abs(block) < SILENCE_THRESHOLD))
+                    total += block.size
+                    if tracks_position:
+                        bytes_per_second.append(reader.hashed - position)
+                        position = reader.hashed
+            decoded = True
+        except RuntimeError:
+            decoded = False
+        reader.finish()
+
+    if not decoded:
+        samples = _ffmpeg_decode(file_path, 16000)
+        sample_rate, channels, frames = 16000, None, len(samples)
+        silent, total = int(np.count_nonzero(np.abs(samples) < SILENCE_THRESHOLD)), len(samples)
+
+    if reader.mpeg is not None and reader.mpeg.frames:
+        bitrate_source = "frame_headers"
+        bytes_per_second = reader.mpeg.bytes_per_second
+    else:
+        bitrate_source = "stream_position" if decoded and bytes_per_second else None
+    avg_bitrate, var_bitrate, rel_var = _rate_stats(bytes_per_second) if bytes_per_second else (None, None, None)
+
+    duration = frames / sample_rate if sample_rate else 0.0
+    bitrate = int(file_size * 8 / duration) if duration else None
+
+    return {
+        'duration_sec': float(duration),
+        'sampling_rate': int(sample_rate) if sample_rate else None,
+        'channels': channels,
+        'format': audio_format,
+        'subtype': subtype,
+        'file_size_bytes': int(file_size),
+        'md5_hash': reader.md5.hexdigest(),
+        'sha256_hash': reader.sha256.hexdigest(),
+        'bitrate': bitrate,
+        'bitrate_source': bitrate_source,
+        'bitrate_avg': avg_bitrate,
+        'bitrate_variance': var_bitrate,
+        'bitrate_stable': bool(rel_var < 0.02) if rel_var is not None else None,
+        'bitrate_relative_variance': rel_var,
+        'percent_silence': round(silent / total * 100, 2) if total else 0.0,
+    }
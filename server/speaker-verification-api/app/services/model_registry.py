@@ -0,0 +1,101 @@
+# app/services/model_registry.py
+import os
+import threading
+import time
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes():
+    """Current resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _parameter_bytes(model):
+    """Size of torch parameters/buffers reachable from a loaded model object."""
+    modules = []
+    for candidate in (model, getattr(model, "model", None), getattr(model, "mods", None)):
+        if candidate is not None and hasattr(candidate, "parameters"):
+            modules.append(candidate)
+    total = 0
+    for module in modules:
+        total += sum(p.numel() * p.element_size() for p in module.parameters())
+        if hasattr(module, "buffers"):
+            total += sum(b.numel() * b.element_size() for b in module.buffers())
+    return total or None
+
+
+class ModelRegistry:
+    """
+    Creates each model on first use and shares one instance per process.
+    Services register a factory at import time; nothing heavy is loaded until get().
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self._stats = {}
+        self._preload = set()
+        self._registry_lock = threading.Lock()
+
+    def register(self, name, factory, preload=True):
+        """preload=False keeps an optional model out of preload(); it still loads on get()."""
+        with self._registry_lock:
+            self._factories[name] = factory
+            if preload:
+                self._preload.add(name)
+            else:
+                self._preload.discard(name)
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        if name not in self._factories:
+            raise KeyError(f"No model registered under '{name}'")
+
+        with self._locks[name]:
+            if name in self._instances:
+                return self._instances[name]
+
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            instance = self._factories[name]()
+            load_seconds = time.perf_counter() - start
+            rss_after = _rss_bytes()
+
+            self._stats[name] = {
+                "load_seconds": round(load_seconds, 3),
+                "rss_delta_mb": round((rss_after - rss_before) / 2**20, 1) if rss_before and rss_after else None,
+                "parameter_mb": None,
+            }
+            param_bytes = _parameter_bytes(instance)
+            if param_bytes:
+                self._stats[name]["parameter_mb"] = round(param_bytes / 2**20, 1)
+
+            self._instances[name] = instance
+            print(f"Loaded model '{name}' in {load_seconds:.1f}s")
+            return instance
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def preload(self, names=None):
+        """Load the given (default: all registered with preload=True) models now."""
+        for name in names or [n for n in self._factories if n in self._preload]:
+            self.get(name)
+
+    def stats(self):
+        return {
+            name: {"loaded": name in self._instances, **self._stats.get(name, {})}
+            for name in self._factories
+        }
+
+
+models = ModelRegistry()
@@ -0,0 +1,186 @@
+# app/services/reference_profile_service.py
+import functools
+import hashlib
+import os
+import pickle
+import threading
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+from .. import config
+from ..utils.audio_buffer import load_audio
+from .background_service import noise_profile, compare_noise_profiles, summarize_noise_profile
+from .hash_service import compute_file_hashes
+from .stage_executor import Stage, StageExecutor
+from .transcript_service import transcribe_detailed
+from .verification_service import compute_embedding
+
+
+class ReferenceProfileStore:
+    """
+    Precomputed analyses of enrolled reference recordings, one pickle per
+    reference id. Profiles are kept in memory along with the pickle's inode
+    and mtime; every get() stats the file, so a profile re-enrolled or removed by another
+    process sharing the directory is picked up on the next use.
+    """
+
+    def __init__(self, profile_dir=config.REFERENCE_PROFILE_DIR):
+        self.profile_dir = profile_dir
+        self._profiles = {}  # reference id -> ((inode, mtime_ns), profile)
+        self._lock = threading.Lock()
+
+    def _path(self, reference_id):
+        # Ids are free text, so files are named by a digest of the id
+        digest = hashlib.sha256(reference_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.profile_dir, f"{digest}.pkl")
+
+    @staticmethod
+    def _stamp(path):
+        # put() replaces the file, so the inode changes even within one mtime tick
+        st = os.stat(path)
+        return st.st_ino, st.st_mtime_ns
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def get(self, reference_id):
+        path = self._path(reference_id)
+        try:
+            stamp = self._stamp(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._profiles.pop(reference_id, None)
+            return None
+        with self._lock:
+            cached = self._profiles.get(reference_id)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        profile = self._read(path)
+        if profile is not None:
+            with self._lock:
+                self._profiles[reference_id] = (stamp, profile)
+        return profile
+
+    def put(self, profile):
+        path = self._path(profile["reference_id"])
+        os.makedirs(self.profile_dir, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(profile, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._profiles[profile["reference_id"]] = (self._stamp(path), profile)
+
+    def remove(self, reference_id):
+        with self._lock:
+            self._profiles.pop(reference_id, None)
+        try:
+            os.remove(self._path(reference_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def profiles(self):
+        """Every stored profile, read from disk."""
+        if not os.path.isdir(self.profile_dir):
+            return []
+        found = []
+        for name in sorted(os.listdir(self.profile_dir)):
+            if name.endswith(".pkl"):
+                profile = self._read(os.path.join(self.profile_dir, name))
+                if profile is not None:
+                    found.append(profile)
+        return found
+
+
+reference_store = ReferenceProfileStore()
+
+
+def summarize_reference(profile):
+    """JSON-friendly view of a reference profile (no embedding or floor track)."""
+    transcript = profile["transcript"]
+    return {
+        "reference_id": profile["reference_id"],
+        "enrolled_at": profile["enrolled_at"],
+        "duration_sec": profile["duration_sec"],
+        "hash_sha256": profile["hashes"]["hash_sha256"],
+        "hash_md5": profile["hashes"]["hash_md5"],
+        "embedding_model": profile["embedding_model"],
+        "transcript_model": transcript["model"],
+        "transcript": transcript["text"],
+        "noise": summarize_noise_profile(profile["noise_profile"]),
+    }
+
+
+def enroll_reference(reference_id, file_path, model_size=None):
+    """
+    Analyse a reference recording once and store the result under reference_id:
+    ECAPA embedding, timestamped transcript, noise profile and file hashes.
+    Reports against the reference then only process the suspected audio.
+    """
+    stages = StageExecutor().run([
+        Stage("audio", load_audio, args=(file_path,)),
+        Stage("hashes", compute_file_hashes, args=(file_path,)),
+        Stage("embedding", compute_embedding, deps=("audio",), limit="ecapa"),
+        Stage("transcript", functools.partial(transcribe_detailed, model_size=model_size),
+              deps=("audio",), limit="whisper"),
+        Stage("noise", noise_profile, deps=("audio",)),
+    ])
+    if stages.errors:
+        name, error = next(iter(stages.errors.items()))
+        raise ValueError(f"Could not build reference profile ({name}): {error}")
+
+    profile = {
+        "reference_id": reference_id,
+        "enrolled_at": datetime.now().isoformat(timespec="seconds"),
+        "duration_sec": round(stages.get("audio").duration, 2),
+        "hashes": stages.get("hashes"),
+        "embedding_model": config.MODEL_SOURCE,
+        "embedding": np.asarray(stages.get("embedding"), dtype=np.float32),
+        "transcript": stages.get("transcript"),
+        "noise_profile": stages.get("noise"),
+    }
+    reference_store.put(profile)
+    return summarize_reference(profile)
+
+
+def get_reference(reference_id):
+    """The stored profile for reference_id; KeyError if it was never enrolled."""
+    profile = reference_store.get(reference_id)
+    if profile is None:
+        raise KeyError(f"Reference '{reference_id}' is not enrolled")
+    return profile
+
+
+def verify_against_reference(profile, suspected):
+    """process_and_verify_files() against a stored embedding."""
+    if profile["embedding_model"] != config.MODEL_SOURCE:
+        raise ValueError(f"Reference '{profile['reference_id']}' was embedded with "
+                         f"{profile['embedding_model']}; re-enroll it")
+    score = float(np.dot(profile["embedding"], compute_embedding(suspected)))
+    return {
+        "score": score,
+        "same_speaker": bool(score > config.VERIFICATION_THRESHOLD),
+    }
+
+
+def transcribe_against_reference(profile, suspected):
+    """(reference_detail, suspected_detail) like transcribe_pair(), with the stored transcript's model."""
+    reference_detail = profile["transcript"]
+    return reference_detail, transcribe_detailed(suspected, model_size=reference_detail["model"])
+
+
+def noise_against_reference(profile, suspected):
+    """Noise features of the suspected audio, compared with the stored reference profile."""
+    suspected_profile = noise_profile(suspected)
+    return {
+        "file1_features": summarize_noise_profile(suspected_profile),
+        "reference_comparison": compare_noise_profiles(profile["noise_profile"], suspected_profile),
+    }
@@ -1,6 +1,7 @@
 from ctypes import c_buffer
 import io
 import os
+import tempfile
 import time
 import qrcode
 from reportlab.lib.pagesizes import A4, letter
@@ -14,44 +15,56 @@ from reportlab.lib import colors
 from werkzeug.utils import secure_filename
 from io import BytesIO
 from PIL import Image as PILImage
-import wave
 from datetime import datetime
 
 # Your existing imports
-from pydub import AudioSegment
+from app import config
 from app.services.verification_service import process_and_verify_files
 from app.services.background_service import analyze_background_noise
-from app.services.ai_detection_service import VoiceDetector
+from app.services.ai_detection_service import detect_synthetic
 from app.services.hash_service import compute_file_hashes
-from app.services.spectrogram_analysis_service import analyze_spectrogram
-from app.services.spectrogram_service import generate_spectrogram
-from app.services.transcript_service import transcribe_audio, compare_transcripts
+from app.services.spectrogram_analysis_service import analyze_spectrogram, analyze_spectrogram_stream
+from app.services.transcript_service import transcribe_pair, compare_transcripts
+from app.services.stage_executor import Stage, StageExecutor
+from app.services.fingerprint_service import check_recording
+from app.services.reference_profile_service import (
+    verify_against_reference, transcribe_against_reference, noise_against_reference)
+from app.utils.audio_buffer import load_audio
+from app.utils.audio_converter import normalize_to_wav
+from app.services.ingest_service import ingest_upload
+from app.utils.workspace import request_workspace
 
 UPLOAD_FOLDER = "uploads"
 SPECTROGRAM_FOLDER = "reports/spectrograms"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(SPECTROGRAM_FOLDER, exist_ok=True)
 
-voice_detector = VoiceDetector()
-
-# Your existing preprocess_audio and _safe_remove functions remain the same
-def preprocess_audio(file, output_dir=UPLOAD_FOLDER):
+def preprocess_audio(file, output_dir=None):
     """
     Convert uploaded audio to WAV 16kHz mono.
-    Returns the saved file path.
+    Returns the saved file path. By default the file goes into the current
+    request's private workspace and is removed automatically after the response.
     """
+    if output_dir is None:
+        output_dir = request_workspace().path
     os.makedirs(output_dir, exist_ok=True)
     filename = secure_filename(file.filename)
-    output_path = os.path.join(output_dir, f"preprocessed_{filename}.wav")
+    fd, output_path = tempfile.mkstemp(prefix="preprocessed_", suffix=f"_{filename}.wav", dir=output_dir)
+    os.close(fd)
 
+    upload = None
     try:
-        # Load audio from the in-memory FileStorage object
-        audio = AudioSegment.from_file(file)
-        audio = audio.set_frame_rate(16000).set_channels(1)
-        audio.export(output_path, format="wav")
+        # Stream the upload to disk (size-limited, hashed on the way) instead of buffering it
+        upload = ingest_upload(file, output_dir)
+        # Decode in-process (soundfile + soxr) block by block; ffmpeg only for formats
+        # that need it. Uploads that are already 16 kHz mono PCM are moved, not decoded.
+        normalize_to_wav(upload.path, output_path, move=True)
     except Exception as e:
         print(f"Error during audio preprocessing: {e}")
         raise e
+    finally:
+        if upload:
+            _safe_remove(upload.path)
 
     return output_path
 
@@ -136,37 +149,108 @@ def get_status_color(result, key):
     else:
         return HexColor('#3498db')
 
-def generate_pdf_report(original_path, suspected_path, report_id):
-    """Generate a professional PDF forensic report"""
-    spectrogram_file_path = None
+def _anomaly_level(spectro_info, duration):
+    """0 (clean), 1 (moderate) or 2 (high): anomaly regions per minute against the config thresholds."""
+    rate = spectro_info.get('anomaly_count', 0) * 60.0 / max(duration, 1.0)
+    if rate > config.SPECTRO_HIGH_REGIONS_PER_MIN:
+        return 2
+    if rate > config.SPECTRO_MODERATE_REGIONS_PER_MIN:
+        return 1
+    return 0
+
+
+def _ai_stage(audio):
+    # The detector reports failures as {"error": ...}; raise so the stage counts as failed
+    result = detect_synthetic(audio)
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return result
+
+
+def _spectro_stage(audio):
+    # Long recordings are streamed from disk instead of holding their full dB matrix
+    if audio.duration > config.STREAM_SPECTRO_MIN_SECONDS and audio.source_path:
+        return analyze_spectrogram_stream(audio.source_path)
+    return analyze_spectrogram(audio)
+
+
+def _transcript_stage(transcripts):
+    original, suspected = transcripts
+    return compare_transcripts(original["text"], suspected["text"], original["segments"], suspected["segments"])
+
+
+def run_report_stages(original_path, suspected_path, reference=None):
+    """
+    Run every analysis needed by the PDF report, independent stages in parallel.
+    With a stored reference profile instead of an original recording, only the
+    suspected audio is processed. Returns a StageResults with per-stage results,
+    errors and timings.
+    """
+    if reference is not None:
+        stages = [
+            Stage("suspected_audio", load_audio, args=(suspected_path,)),
+            Stage("file_hash", compute_file_hashes, args=(suspected_path,)),
+            Stage("voice", verify_against_reference, args=(reference,), deps=("suspected_audio",), limit="ecapa"),
+            Stage("ai", _ai_stage, deps=("suspected_audio",)),
+            Stage("noise", noise_against_reference, args=(reference,), deps=("suspected_audio",)),
+            Stage("transcripts", transcribe_against_reference, args=(reference,), deps=("suspected_audio",),
+                  limit="whisper"),
+            Stage("transcript", _transcript_stage, deps=("transcripts",)),
+            Stage("spectro_info", _spectro_stage, deps=("suspected_audio",)),
+            Stage("reuse", check_recording, deps=("suspected_audio",)),
+        ]
+        return StageExecutor().run(stages)
+
+    stages = [
+        Stage("original_audio", load_audio, args=(original_path,)),
+        Stage("suspected_audio", load_audio, args=(suspected_path,)),
+        Stage("file_hash", compute_file_hashes, args=(suspected_path,)),
+        Stage("voice", process_and_verify_files, deps=("original_audio", "suspected_audio"), limit="ecapa"),
+        Stage("ai", _ai_stage, deps=("suspected_audio",)),  # batcher serialises the model
+        Stage("noise", analyze_background_noise, deps=("suspected_audio",)),
+        Stage("transcripts", transcribe_pair, deps=("original_audio", "suspected_audio"), limit="whisper"),
+        Stage("transcript", _transcript_stage, deps=("transcripts",)),
+        Stage("spectro_info", _spectro_stage, deps=("suspected_audio",)),
+        Stage("reuse", check_recording, deps=("suspected_audio",)),  # fingerprint lookup only
+    ]
+    return StageExecutor().run(stages)
+
+
+def generate_pdf_report(original_path, suspected_path, report_id, reference=None):
+    """
+    Generate a professional PDF forensic report.
+    Each input is decoded once into a DecodedAudio shared by all analyzers,
+    and independent analyses run concurrently. Pass a stored reference profile
+    (see reference_profile_service) with original_path=None to compare against
+    an enrolled reference.
+    """
+    spectro_info = {}
     
     try:
         # Collect all analysis data
-        voice_result = process_and_verify_files(original_path, suspected_path)
-        ai_result = voice_detector.is_synthetic(suspected_path)
-        noise_result = analyze_background_noise(suspected_path)
-        
-        original_text = transcribe_audio(original_path)
-        suspected_text = transcribe_audio(suspected_path)
-        transcript_result = compare_transcripts(original_text, suspected_text)
-        
-        spectrogram_file_name = generate_spectrogram(suspected_path)
-        spectrogram_file_path = os.path.join(SPECTROGRAM_FOLDER, spectrogram_file_name)
-        
-        # Try to get additional spectrogram analysis data
-        try:
-            spectro_info = analyze_spectrogram(spectrogram_file_path)
-        except:
-            spectro_info = {}
-        
-        file_hash = compute_file_hashes(suspected_path)
+        stages = run_report_stages(original_path, suspected_path, reference)
+        for name in ("original_audio", "suspected_audio"):
+            if name in stages.errors:
+                raise ValueError(f"Could not decode {name.replace('_', ' ')}: {stages.errors[name]}")
+
+        suspected_audio = stages.get("suspected_audio")
+        voice_result = stages.get("voice", {})
+        ai_result = stages.get("ai", {})
+        noise_result = stages.get("noise", {})
+        original_detail, suspected_detail = stages.get("transcripts", ({"text": ""}, {"text": ""}))
+        original_text = original_detail["text"]
+        suspected_text = suspected_detail["text"]
+        transcript_result = stages.get("transcript", {})
+        spectro_info = stages.get("spectro_info", {})
+        file_hash = stages.get("file_hash", {})
+        reuse_matches = stages.get("reuse", {}).get("matches", [])
         
         # Audio file info
-        with wave.open(suspected_path, 'rb') as w:
-            duration = round(w.getnframes() / w.getframerate(), 2)
-            sample_rate = w.getframerate()
-            channels = w.getnchannels()
-            file_size = os.path.getsize(suspected_path)
+        duration = round(suspected_audio.duration, 2)
+        sample_rate = suspected_audio.source_sample_rate
+        channels = suspected_audio.source_channels
+        file_size = suspected_audio.file_size
+        anomaly_level = _anomaly_level(spectro_info, duration)
         
         # Create PDF with proper margins for header/footer
         pdf_buffer = io.BytesIO()
@@ -219,7 +303,7 @@ def generate_pdf_report(original_path, suspected_path, report_id):
         story = []
         
         # Title and Report ID with improved styling
-        story.append(Paragraph(f"Audio Forensic Analysis Report", title_style))
+        story.append(Paragraph("Audio Forensic Analysis Report", title_style))
         story.append(Spacer(1, 10))
         
         # Report metadata in a clean table
@@ -229,6 +313,8 @@ def generate_pdf_report(original_path, suspected_path, report_id):
             ['Report Type:', 'Comprehensive Audio Forensic Analysis'],
             ['System Version:', 'Audio Forensics v2.0']
         ]
+        if reference is not None:
+            metadata_data.append(['Reference ID:', f"{reference['reference_id']} (enrolled {reference['enrolled_at']})"])
         
         metadata_table = Table(metadata_data, colWidths=[2*inch, 4*inch])
         metadata_table.setStyle(TableStyle([
@@ -248,26 +334,27 @@ def generate_pdf_report(original_path, suspected_path, report_id):
         story.append(Paragraph("Executive Summary", heading_style))
         
         # Create enhanced summary table
+        # Stages that failed have no result to summarise
+        unavailable = ['Not available', 'N/A', 'Not available']
         summary_data = [
             ['Analysis Component', 'Result', 'Confidence', 'Status'],
-            ['Voice Matching', 
+            ['Voice Matching'] + (unavailable if 'voice' in stages.errors else [
              f"{'Same Speaker' if voice_result.get('same_speaker') else 'Different Speaker'}",
              f"{voice_result.get('score', 0):.3f}",
-             '✓ MATCH' if voice_result.get('same_speaker') else '✗ NO MATCH'],
-            ['AI Synthetic Detection', 
+             '✓ MATCH' if voice_result.get('same_speaker') else '✗ NO MATCH']),
+            ['AI Synthetic Detection'] + (unavailable if 'ai' in stages.errors else [
              f"{ai_result.get('label', 'Unknown')}",
              f"{ai_result.get('score', 0):.4f}",
-             '⚠ SYNTHETIC' if ai_result.get('label') == 'SYNTHETIC' else '✓ AUTHENTIC'],
-            ['Transcript Similarity', 
+             '⚠ SYNTHETIC' if ai_result.get('label') == 'SYNTHETIC' else '✓ AUTHENTIC']),
+            ['Transcript Similarity'] + (unavailable if 'transcript' in stages.errors else [
              f"{transcript_result.get('similarity_score', 0):.1f}% Match",
              'N/A',
              '✓ HIGH' if transcript_result.get('similarity_score', 0) > 80 else 
-             '⚠ MEDIUM' if transcript_result.get('similarity_score', 0) > 50 else '✗ LOW'],
-            ['Spectrogram Analysis',
+             '⚠ MEDIUM' if transcript_result.get('similarity_score', 0) > 50 else '✗ LOW']),
+            ['Spectrogram Analysis'] + (unavailable if 'spectro_info' in stages.errors else [
              f"{spectro_info.get('anomaly_count', 0)} Anomalies",
              'Automated',
-             '✓ CLEAN' if spectro_info.get('anomaly_count', 0) < 100 else 
-             '⚠ SUSPICIOUS' if spectro_info.get('anomaly_count', 0) < 200 else '✗ HIGH RISK']
+             ['✓ CLEAN', '⚠ SUSPICIOUS', '✗ HIGH RISK'][anomaly_level]])
         ]
         
         summary_table = Table(summary_data, colWidths=[2.2*inch, 1.8*inch, 1*inch, 1*inch])
@@ -298,7 +385,8 @@ def generate_pdf_report(original_path, suspected_path, report_id):
             ['Channel Count', f"{channels} ({'Mono' if channels == 1 else 'Stereo' if channels == 2 else 'Multi-channel'})", "Audio configuration"],
             ['File Size', f"{file_size:,} bytes", f"≈ {file_size/(1024*1024):.2f} MB"],
             ['Bit Depth', "16-bit (estimated)", "Standard PCM encoding"],
-            ['SHA256 Hash', file_hash.get('hash_sha256', 'N/A')[:24] + '...', 'Digital fingerprint (truncated)']
+            ['SHA256 Hash', file_hash.get('hash_sha256', 'N/A')[:24] + '...', 'Digital fingerprint (truncated)'],
+            ['Archive Matches', f"{len(reuse_matches)} earlier recording(s)", 'Acoustic fingerprint lookup']
         ]
         
         file_table = Table(file_data, colWidths=[1.8*inch, 2.2*inch, 2*inch])
@@ -316,6 +404,31 @@ def generate_pdf_report(original_path, suspected_path, report_id):
         ]))
         
         story.append(file_table)
+
+        # Earlier recordings containing the same audio (re-encoded or re-recorded copies)
+        if reuse_matches:
+            story.append(Spacer(1, 10))
+            story.append(Paragraph("<b>Audio reused from archived recordings:</b>", content_style))
+            reuse_data = [['Archived Recording', 'Suspected Span', 'Position in Archive', 'Aligned Landmarks']]
+            for match in reuse_matches:
+                reuse_data.append([
+                    Paragraph(f"{match['name'] or '-'} ({match['sha256'][:12]}...)", content_style),
+                    f"{match['query_start_sec']:.1f}s - {match['query_end_sec']:.1f}s",
+                    f"{match['offset_sec'] + match['query_start_sec']:.1f}s",
+                    f"{match['aligned_hashes']} ({match['query_coverage'] * 100:.1f}%)",
+                ])
+            reuse_table = Table(reuse_data, colWidths=[2.4*inch, 1.3*inch, 1.3*inch, 1.2*inch])
+            reuse_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), HexColor('#1a365d')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), white),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, -1), 9),
+                ('BACKGROUND', (0, 1), (-1, -1), HexColor('#f8f9fa')),
+                ('GRID', (0, 0), (-1, -1), 1, HexColor('#dee2e6')),
+                ('PADDING', (0, 0), (-1, -1), 6),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ]))
+            story.append(reuse_table)
         story.append(PageBreak())
         
         # Detailed Analysis Sections
@@ -330,9 +443,12 @@ def generate_pdf_report(original_path, suspected_path, report_id):
         
         # 2. AI Detection Analysis
         story.append(Paragraph("2. Artificial Intelligence Synthesis Detection", heading_style))
-        story.append(Paragraph(f"<b>Classification Result:</b> {ai_result.get('label', 'Unknown')}", content_style))
-        story.append(Paragraph(f"<b>Detection Confidence:</b> {ai_result.get('score', 0):.6f}", content_style))
-        story.append(Paragraph(f"<b>Risk Assessment:</b> {'High Risk - Likely Synthetic' if ai_result.get('label') == 'SYNTHETIC' else 'Low Risk - Appears Authentic'}", content_style))
+        if 'ai' in stages.errors:
+            story.append(Paragraph("<b>Classification Result:</b> Not available (detection failed)", content_style))
+        else:
+            story.append(Paragraph(f"<b>Classification Result:</b> {ai_result.get('label', 'Unknown')}", content_style))
+            story.append(Paragraph(f"<b>Detection Confidence:</b> {ai_result.get('score', 0):.6f}", content_style))
+            story.append(Paragraph(f"<b>Risk Assessment:</b> {'High Risk - Likely Synthetic' if ai_result.get('label') == 'SYNTHETIC' else 'Low Risk - Appears Authentic'}", content_style))
         story.append(Paragraph("<b>Technology:</b> Deep learning neural network trained on thousands of synthetic and authentic voice samples, detecting artifacts from TTS systems, voice cloning, and deepfake audio generation.", content_style))
         story.append(Spacer(1, 15))
         
@@ -349,7 +465,10 @@ def generate_pdf_report(original_path, suspected_path, report_id):
             'zero_crossing_rate': 'Audio texture and noisiness',
             'energy': 'Total acoustic energy content',
             'rms_energy': 'Root mean square energy level',
-            'spectral_rolloff': 'Frequency distribution measure'
+            'spectral_rolloff': 'Frequency distribution measure',
+            'noise_floor_db': 'Median background level (dBFS)',
+            'noise_floor_variation_db': 'Background level stability over time',
+            'splice_count': 'Abrupt background changes (possible edits)'
         }
         
         # Function to convert numeric values to percentage scores (0-100%)
@@ -358,7 +477,15 @@ def generate_pdf_report(original_path, suspected_path, report_id):
                 return "N/A"
             
             # Convert different metrics to 0-100% quality scores
-            if 'snr' in key.lower():
+            if 'noise_floor_variation' in key.lower():
+                # Floor variation: lower is steadier, typical range 0-10 dB
+                score = max(0, 100 - value * 10)
+            elif 'noise_floor' in key.lower():
+                # Noise floor: lower is cleaner, typical range -80 to -20 dBFS
+                score = min(100, max(0, (-20 - value) / 60 * 100))
+            elif 'splice' in key.lower():
+                score = max(0, 100 - value * 25)
+            elif 'snr' in key.lower():
                 # SNR: higher is better, typical range 0-40 dB
                 score = min(100, max(0, (value / 40) * 100))
             elif 'noise_level' in key.lower():
@@ -382,8 +509,11 @@ def generate_pdf_report(original_path, suspected_path, report_id):
             
             return f"{score:.1f}%"
         
-        for key, value in noise_result.items():
+        noise_features = noise_result.get('file1_features', noise_result)
+        for key, value in noise_features.items():
             # Skip if the value is a complex object or string representation
+            if isinstance(value, (dict, list)) or value is None:
+                continue
             if isinstance(value, str) and ('array' in value or 'dtype' in value or len(value) > 50):
                 continue
                 
@@ -422,6 +552,37 @@ def generate_pdf_report(original_path, suspected_path, report_id):
             ('ALIGN', (2, 1), (2, -1), 'CENTER'),  # Center align the score column
         ]))
         story.append(noise_table)
+
+        # Background compared with the enrolled reference's stored noise profile
+        reference_noise = noise_result.get('reference_comparison')
+        if reference_noise:
+            story.append(Spacer(1, 10))
+            story.append(Paragraph(
+                f"<b>Background vs. Reference:</b> noise floor differs by {reference_noise['floor_diff_db']:+.1f} dB, "
+                f"band-shape distance {reference_noise['shape_distance_db']:.1f} dB "
+                f"({'significant difference' if reference_noise['is_significant_diff'] else 'consistent'})", content_style))
+
+        # Noise-floor discontinuities located in the recording
+        splice_points = noise_features.get('splice_points', [])
+        if splice_points:
+            story.append(Spacer(1, 10))
+            story.append(Paragraph(
+                f"<b>Background Discontinuities:</b> {len(splice_points)} abrupt noise-floor change(s) "
+                f"of more than {config.NOISE_SPLICE_DB:g} dB, consistent with possible splice points:", content_style))
+            splice_data = [['Time', 'Floor Change']]
+            for point in splice_points[:15]:
+                splice_data.append([f"{point['time_sec']:.2f}s", f"{point['jump_db']:+.1f} dB"])
+            splice_table = Table(splice_data, colWidths=[1.5*inch, 1.5*inch])
+            splice_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), HexColor('#1a365d')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), white),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, -1), 9),
+                ('BACKGROUND', (0, 1), (-1, -1), HexColor('#f8f9fa')),
+                ('GRID', (0, 0), (-1, -1), 1, HexColor('#dee2e6')),
+                ('PADDING', (0, 0), (-1, -1), 6),
+            ]))
+            story.append(splice_table)
         story.append(Spacer(1, 15))
         
         # 4. Transcript Comparison
@@ -445,6 +606,37 @@ def generate_pdf_report(original_path, suspected_path, report_id):
         story.append(Spacer(1, 8))
         story.append(Paragraph(f"<b>Suspected Audio Transcript:</b>", content_style))
         story.append(Paragraph(f'<i>"{suspected_display}"</i>', content_style))
+
+        # Word-level differences, located in the suspected recording where timestamps exist
+        differences = transcript_result.get('differences', [])
+        if differences:
+            story.append(Spacer(1, 10))
+            story.append(Paragraph(
+                f"<b>Word Error Rate:</b> {transcript_result.get('wer', 0) * 100:.1f}% "
+                f"({transcript_result.get('substitutions', 0)} substituted, "
+                f"{transcript_result.get('deletions', 0)} deleted, "
+                f"{transcript_result.get('insertions', 0)} inserted)", content_style))
+            diff_data = [['Time (suspected)', 'Change', 'Original', 'Suspected']]
+            for diff in differences[:15]:
+                at = diff.get('suspected_time')
+                diff_data.append([
+                    f"{at['start']:.1f}s - {at['end']:.1f}s" if at else '-',
+                    diff['type'].title(),
+                    Paragraph(diff['original'][:80] or '-', content_style),
+                    Paragraph(diff['suspected'][:80] or '-', content_style),
+                ])
+            diff_table = Table(diff_data, colWidths=[1.2*inch, 0.9*inch, 2.2*inch, 2.2*inch])
+            diff_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), HexColor('#1a365d')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), white),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, -1), 9),
+                ('BACKGROUND', (0, 1), (-1, -1), HexColor('#f8f9fa')),
+                ('GRID', (0, 0), (-1, -1), 1, HexColor('#dee2e6')),
+                ('PADDING', (0, 0), (-1, -1), 6),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ]))
+            story.append(diff_table)
         story.append(PageBreak())
         
         # 5. Enhanced Spectrogram Analysis with Forensic Metrics
@@ -455,13 +647,12 @@ def generate_pdf_report(original_path, suspected_path, report_id):
         if spectro_info:
             spectro_data = [
                 ['Forensic Metric', 'Measured Value', 'Forensic Interpretation', 'Status'],
-                ['Peak Intensity', f"{spectro_info.get('max_intensity', 0)}", 'Maximum signal strength detected', '✓ Normal'],
-                ['Average Intensity', f"{spectro_info.get('mean_intensity', 0):.2f}", 'Overall signal level consistency', '✓ Stable'],
-                ['Noise Floor', f"{spectro_info.get('min_intensity', 0)}", 'Background noise baseline', '✓ Clean'],
-                ['Intensity Variation', f"{spectro_info.get('std_intensity', 0):.2f}", 'Signal stability measure', '✓ Consistent'],
-                ['Anomaly Detection', f"{spectro_info.get('anomaly_count', 0)}", 'Suspicious artifacts found', 
-                 '✓ Clean' if spectro_info.get('anomaly_count', 0) < 50 else 
-                 '⚠ Moderate' if spectro_info.get('anomaly_count', 0) < 150 else '✗ High Risk']
+                ['Peak Intensity', f"{spectro_info.get('max_intensity', 0):.1f} dB", 'Maximum signal strength detected', '✓ Normal'],
+                ['Average Intensity', f"{spectro_info.get('mean_intensity', 0):.2f} dB", 'Overall signal level consistency', '✓ Stable'],
+                ['Noise Floor', f"{spectro_info.get('min_intensity', 0):.1f} dB", 'Background noise baseline', '✓ Clean'],
+                ['Intensity Variation', f"{spectro_info.get('std_intensity', 0):.2f} dB", 'Signal stability measure', '✓ Consistent'],
+                ['Anomaly Detection', f"{spectro_info.get('anomaly_count', 0)}", 'Suspicious regions, rated per minute of audio', 
+                 ['✓ Clean', '⚠ Moderate', '✗ High Risk'][anomaly_level]]
             ]
             
             spectro_table = Table(spectro_data, colWidths=[1.5*inch, 1.2*inch, 2.3*inch, 1*inch])
@@ -477,21 +668,19 @@ def generate_pdf_report(original_path, suspected_path, report_id):
                 ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
                 # Conditional formatting for anomaly count
                 ('BACKGROUND', (0, 5), (-1, 5), 
-                 HexColor('#fee2e2') if spectro_info.get('anomaly_count', 0) > 150 else 
-                 HexColor('#fef3c7') if spectro_info.get('anomaly_count', 0) > 50 else HexColor('#f0fdf4')),
+                 [HexColor('#f0fdf4'), HexColor('#fef3c7'), HexColor('#fee2e2')][anomaly_level]),
             ]))
             
             story.append(spectro_table)
             story.append(Spacer(1, 15))
             
             # Add detailed forensic interpretation
-            anomaly_count = spectro_info.get('anomaly_count', 0)
-            if anomaly_count > 150:
+            if anomaly_level == 2:
                 story.append(Paragraph("<b>🚨 HIGH RISK ASSESSMENT:</b> Significant spectral anomalies detected. This pattern is consistent with synthetic voice generation, heavy audio editing, or post-processing artifacts. Recommend additional verification.", 
                                      ParagraphStyle('HighRisk', parent=content_style, textColor=HexColor('#dc2626'), 
                                                   backColor=HexColor('#fee2e2'), borderColor=HexColor('#fca5a5'), 
                                                   borderWidth=1, borderPadding=8)))
-            elif anomaly_count > 50:
+            elif anomaly_level == 1:
                 story.append(Paragraph("<b>⚠️ MODERATE RISK ASSESSMENT:</b> Some spectral anomalies detected. May indicate minor editing, compression artifacts, or recording quality issues. Further investigation recommended.", 
                                      ParagraphStyle('ModerateRisk', parent=content_style, textColor=HexColor('#d97706'), 
                                                   backColor=HexColor('#fef3c7'), borderColor=HexColor('#fbbf24'), 
@@ -505,7 +694,7 @@ def generate_pdf_report(original_path, suspected_path, report_id):
             story.append(Spacer(1, 15))
         
         # Display highlighted spectrogram with anomaly markers
-        highlighted_path = spectro_info.get('highlighted_path') if spectro_info else spectrogram_file_path
+        highlighted_path = spectro_info.get('highlighted_path') if spectro_info else None
         
         if highlighted_path and os.path.exists(highlighted_path):
             try:
@@ -525,33 +714,40 @@ def generate_pdf_report(original_path, suspected_path, report_id):
                 # Add comprehensive interpretation guide
                 story.append(Spacer(1, 12))
                 story.append(Paragraph("<b>Professional Spectrogram Analysis Legend:</b>", content_style))
-                story.append(Paragraph("• <b style='color: red;'>Red Rectangles:</b> Computer-detected anomalies indicating possible synthetic generation or editing artifacts", content_style))
+                story.append(Paragraph("• <b>Cyan Rectangles:</b> Computer-detected anomalies indicating possible synthetic generation or editing artifacts", content_style))
                 story.append(Paragraph("• <b>Bright Yellow/White Areas:</b> High-energy frequency components (vocal formants, harmonics)", content_style))
                 story.append(Paragraph("• <b>Dark Blue/Black Areas:</b> Low-energy regions (silence, background noise)", content_style))
                 story.append(Paragraph("• <b>Vertical Axis:</b> Frequency spectrum (Hz) - human voice typically 85-255 Hz fundamental", content_style))
                 story.append(Paragraph("• <b>Horizontal Axis:</b> Time progression of audio sample", content_style))
-                story.append(Paragraph(f"• <b>Detection Threshold:</b> Intensity > 200 (out of 255 maximum) triggers anomaly flag", content_style))
+                story.append(Paragraph(f"• <b>Detection Threshold:</b> Connected regions above {config.SPECTRO_ANOMALY_DB:+.0f} dB (relative to peak) of at least {config.SPECTRO_ANOMALY_MIN_CELLS} STFT cells", content_style))
+
+                # Largest anomalous regions, located in time and frequency
+                regions = spectro_info.get('anomaly_regions', [])[:10]
+                if regions:
+                    story.append(Spacer(1, 10))
+                    region_data = [['Time (s)', 'Frequency (Hz)', 'Peak (dB)', 'Cells']]
+                    for region in regions:
+                        region_data.append([
+                            f"{region['start']:.2f} - {region['end']:.2f}",
+                            f"{region['low_hz']:.0f} - {region['high_hz']:.0f}",
+                            f"{region['peak_db']:.1f}",
+                            str(region['cells']),
+                        ])
+                    region_table = Table(region_data, colWidths=[1.6*inch, 1.8*inch, 1.2*inch, 1*inch])
+                    region_table.setStyle(TableStyle([
+                        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#1a365d')),
+                        ('TEXTCOLOR', (0, 0), (-1, 0), white),
+                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                        ('FONTSIZE', (0, 0), (-1, -1), 9),
+                        ('BACKGROUND', (0, 1), (-1, -1), HexColor('#f8f9fa')),
+                        ('GRID', (0, 0), (-1, -1), 1, HexColor('#dee2e6')),
+                        ('PADDING', (0, 0), (-1, -1), 6),
+                    ]))
+                    story.append(region_table)
                 
             except Exception as e:
                 story.append(Paragraph(f"Error loading enhanced spectrogram: {str(e)}", content_style))
                 
-        elif spectrogram_file_path and os.path.exists(spectrogram_file_path):
-            # Fallback to original spectrogram
-            try:
-                pil_img = PILImage.open(spectrogram_file_path)
-                img_width = 7 * inch
-                img_height = (pil_img.height / pil_img.width) * img_width
-                
-                if img_height > 5 * inch:
-                    img_height = 5 * inch
-                    img_width = (pil_img.width / pil_img.height) * img_height
-                
-                story.append(Paragraph("<b>Standard Spectrogram Analysis:</b>", content_style))
-                story.append(Spacer(1, 8))
-                story.append(Image(spectrogram_file_path, width=img_width, height=img_height))
-                
-            except Exception as e:
-                story.append(Paragraph(f"Error loading spectrogram: {str(e)}", content_style))
         else:
             story.append(Paragraph("⚠️ Spectrogram analysis unavailable - file may be corrupted or unsupported format", content_style))
         
@@ -611,32 +807,33 @@ def generate_pdf_report(original_path, suspected_path, report_id):
         story.append(Spacer(1, 20))
         story.append(Paragraph("7. Final Assessment & Recommendations", heading_style))
         
-        # Generate overall risk assessment
+        # Generate overall risk assessment; failed stages add no risk factors
         risk_score = 0
         risk_factors = []
         
         # Voice matching risk
-        if not voice_result.get('same_speaker'):
+        if 'voice' not in stages.errors and not voice_result.get('same_speaker'):
             risk_score += 3
             risk_factors.append("Voice patterns do not match reference sample")
         
         # AI detection risk
-        if ai_result.get('label') == 'SYNTHETIC':
+        if 'ai' not in stages.errors and ai_result.get('label') == 'SYNTHETIC':
             risk_score += 4
             risk_factors.append("High probability of AI-generated synthetic speech")
         
         # Transcript similarity risk
-        if transcript_result.get('similarity_score', 0) < 50:
+        if 'transcript' not in stages.errors and transcript_result.get('similarity_score', 0) < 50:
             risk_score += 2
             risk_factors.append("Low transcript content similarity")
         
         # Spectrogram anomaly risk
-        if spectro_info.get('anomaly_count', 0) > 150:
-            risk_score += 3
-            risk_factors.append("High number of spectral anomalies detected")
-        elif spectro_info.get('anomaly_count', 0) > 50:
-            risk_score += 1
-            risk_factors.append("Moderate spectral anomalies present")
+        if 'spectro_info' not in stages.errors:
+            if anomaly_level == 2:
+                risk_score += 3
+                risk_factors.append("High number of spectral anomalies detected")
+            elif anomaly_level == 1:
+                risk_score += 1
+                risk_factors.append("Moderate spectral anomalies present")
         
         # Overall assessment
         if risk_score >= 6:
@@ -675,6 +872,13 @@ def generate_pdf_report(original_path, suspected_path, report_id):
                              ParagraphStyle('Recommendation', parent=content_style, 
                                           textColor=assessment_color, fontName='Helvetica-Bold')))
         
+        # Stages that failed are reported rather than aborting the whole report
+        if stages.errors:
+            story.append(Spacer(1, 15))
+            story.append(Paragraph(f"<b>Incomplete Analyses:</b>", content_style))
+            for name, error in stages.errors.items():
+                story.append(Paragraph(f"• {name.replace('_', ' ').title()}: {error}", content_style))
+        
         # Report completion note
         story.append(Spacer(1, 25))
         story.append(Paragraph("End of Report", 
@@ -694,7 +898,5 @@ def generate_pdf_report(original_path, suspected_path, report_id):
         # Clean up temporary files including highlighted spectrogram
         _safe_remove(original_path)
         _safe_remove(suspected_path)
-        if spectrogram_file_path:
-            _safe_remove(spectrogram_file_path)
         if 'spectro_info' in locals() and spectro_info and spectro_info.get('highlighted_path'):
             _safe_remove(spectro_info['highlighted_path'])
\ No newline at end of file
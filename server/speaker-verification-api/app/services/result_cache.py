@@ -0,0 +1,182 @@
+# app/services/result_cache.py
+import functools
+import hashlib
+import os
+import pickle
+import threading
+import uuid
+from collections import OrderedDict
+
+from .. import config
+from .hash_service import compute_file_hashes
+from ..utils.audio_buffer import DecodedAudio
+
+
+class _Uncacheable(Exception):
+    """Raised while building a key when an argument has no stable content hash."""
+
+
+class ResultCache:
+    """
+    Two-tier cache of analysis results keyed by content hash.
+    Tier 1 is an in-process LRU; tier 2 is a directory of pickles trimmed
+    oldest-first once it grows past max_disk_bytes.
+    """
+
+    def __init__(self, disk_dir=config.CACHE_DIR, memory_items=config.CACHE_MEMORY_ITEMS,
+                 max_disk_bytes=config.CACHE_MAX_DISK_BYTES):
+        self.disk_dir = disk_dir
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None  # computed lazily on first write
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pkl")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)  # mtime doubles as last-access time for eviction
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+
+        self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        self._remember(key, value)
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._account(os.path.getsize(path))
+
+    def _account(self, added_bytes):
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+            else:
+                self._disk_bytes += added_bytes
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+            self._evict()
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _evict(self):
+        """Delete least recently used files until the disk tier is at 90% of its budget."""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = self.max_disk_bytes * 0.9
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+
+result_cache = ResultCache()
+
+
+def content_hash(audio):
+    """SHA-256 of a recording, memoised on DecodedAudio objects."""
+    if isinstance(audio, DecodedAudio):
+        if audio.sha256 is None:
+            if audio.source_path and os.path.exists(audio.source_path):
+                audio.sha256 = compute_file_hashes(audio.source_path)["hash_sha256"]
+            else:
+                audio.sha256 = hashlib.sha256(audio.samples.tobytes()).hexdigest()
+        return audio.sha256
+    if isinstance(audio, (str, os.PathLike)) and os.path.isfile(audio):
+        return compute_file_hashes(audio)["hash_sha256"]
+    raise _Uncacheable()
+
+
+def _key_part(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return repr(value)
+    if isinstance(value, DecodedAudio) or isinstance(value, (str, os.PathLike)):
+        return content_hash(value)
+    raise _Uncacheable()
+
+
+def _option_part(value):
+    """Keyword arguments: plain strings are options (e.g. a model size), not file paths."""
+    if isinstance(value, str) and not os.path.isfile(value):
+        return repr(value)
+    return _key_part(value)
+
+
+def cached_result(namespace, version):
+    """
+    Cache a service function on the content hashes of its audio arguments.
+    namespace/version should name the model and its revision so that a model
+    upgrade never serves stale results. Results containing an "error" key and
+    calls with arguments that cannot be hashed (e.g. FileStorage) bypass the cache.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not config.CACHE_ENABLED:
+                return func(*args, **kwargs)
+
+            try:
+                parts = [_key_part(a) for a in args]
+                parts += [f"{k}={_option_part(v)}" for k, v in sorted(kwargs.items())]
+            except _Uncacheable:
+                return func(*args, **kwargs)
+
+            key = hashlib.sha256("|".join([namespace, str(version)] + parts).encode()).hexdigest()
+            hit = result_cache.get(key)
+            if hit is not None:
+                return hit
+
+            result = func(*args, **kwargs)
+            if result is not None and not (isinstance(result, dict) and "error" in result):
+                try:
+                    result_cache.set(key, result)
+                except OSError as e:
+                    print(f"Result cache write failed: {e}")
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,76 @@
+# app/services/speaker_index_service.py
+import os
+import numpy as np
+
+from .. import config
+from .embedding_store import EmbeddingStore
+from .verification_service import compute_embedding
+
+
+class SpeakerIndex:
+    """
+    Index of enrolled speakers, one normalised ECAPA embedding each, kept in a
+    memory-mapped EmbeddingStore so every worker process shares one copy and
+    opening the index reads nothing but the id mapping.
+    """
+
+    def __init__(self, store_dir=config.SPEAKER_INDEX_DIR, legacy_path=config.SPEAKER_INDEX_PATH):
+        self.store = EmbeddingStore(store_dir)
+        self._import_legacy(legacy_path)
+
+    def _import_legacy(self, legacy_path):
+        """Copy a pre-memmap .npz index into an empty store once."""
+        if not legacy_path or not os.path.exists(legacy_path) or len(self.store):
+            return
+        with np.load(legacy_path, allow_pickle=False) as data:
+            for speaker_id, embedding in zip(data["ids"], data["embeddings"]):
+                self.store.put(str(speaker_id), embedding)
+
+    def __len__(self):
+        return len(self.store)
+
+    def speakers(self):
+        return self.store.ids()
+
+    def enroll(self, speaker_id, embedding):
+        """Add or replace the embedding stored for speaker_id."""
+        self.store.put(speaker_id, embedding)
+
+    def remove(self, speaker_id):
+        return self.store.remove(speaker_id)
+
+    def search(self, embedding, top_k=config.IDENTIFY_TOP_K):
+        """
+        Score a query embedding against every enrolled speaker, block by block.
+        Returns the top_k matches sorted by descending cosine score.
+        """
+        ids, scores = self.store.top_k(embedding, int(top_k))  # rows are unit-norm: cosine
+        return [
+            {
+                "speaker_id": speaker_id,
+                "score": float(score),
+                "same_speaker": bool(score > config.VERIFICATION_THRESHOLD),
+            }
+            for speaker_id, score in zip(ids, scores)
+        ]
+
+
+speaker_index = SpeakerIndex()
+
+
+def enroll_speaker(speaker_id, file_path):
+    """Embed an audio file and store it under speaker_id."""
+    embedding = compute_embedding(file_path)
+    speaker_index.enroll(speaker_id, embedding)
+    return {"speaker_id": speaker_id, "enrolled_speakers": len(speaker_index)}
+
+
+def identify_speaker(file_path, top_k=config.IDENTIFY_TOP_K):
+    """Embed the query once and return the best matching enrolled speakers."""
+    embedding = compute_embedding(file_path)
+    matches = speaker_index.search(embedding, top_k)
+    return {
+        "matches": matches,
+        "best_match": matches[0] if matches and matches[0]["same_speaker"] else None,
+        "enrolled_speakers": len(speaker_index),
+    }
@@ -1,41 +1,210 @@
-import cv2
+import heapq
+import os
+import uuid
 import numpy as np
+import soundfile as sf
+from scipy import ndimage
 
-def analyze_spectrogram(spectrogram_path):
+from .. import config
+from ..utils.spectrogram_render import save_spectrogram
+from ..utils.streaming_stft import RunningStats, stream_power_frames, frame_count, power_to_db
+from .spectrogram_service import SPECTROGRAM_FOLDER, N_FFT, HOP_LENGTH, spectrogram_db
+
+_CONNECTIVITY = np.ones((3, 3), dtype=bool)  # diagonal neighbours join a region
+
+
+def find_anomaly_regions(S_db, sr, hop_length=HOP_LENGTH, n_fft=N_FFT,
+                         threshold_db=config.SPECTRO_ANOMALY_DB,
+                         min_cells=config.SPECTRO_ANOMALY_MIN_CELLS):
+    """
+    Connected time-frequency regions of the dB matrix above threshold_db.
+    Regions smaller than min_cells STFT cells are ignored. Returns a list of
+    {"start", "end" (s), "low_hz", "high_hz", "peak_db", "cells"}, largest first.
+    """
+    labels, count = ndimage.label(S_db > threshold_db, structure=_CONNECTIVITY)
+    if count == 0:
+        return []
+
+    index = np.arange(1, count + 1)
+    cells = np.bincount(labels.ravel(), minlength=count + 1)[1:]
+    peaks = ndimage.maximum(S_db, labels, index)
+    hz_per_bin = sr / n_fft
+    seconds_per_frame = hop_length / sr
+
+    regions = []
+    for label, box in enumerate(ndimage.find_objects(labels)):
+        if box is None or cells[label] < min_cells:
+            continue
+        rows, cols = box
+        regions.append({
+            "start": round(cols.start * seconds_per_frame, 3),
+            "end": round(cols.stop * seconds_per_frame, 3),
+            "low_hz": round(rows.start * hz_per_bin, 1),
+            "high_hz": round(rows.stop * hz_per_bin, 1),
+            "peak_db": round(float(peaks[label]), 2),
+            "cells": int(cells[label]),
+        })
+    regions.sort(key=lambda r: r["cells"], reverse=True)
+    return regions
+
+
+def analyze_spectrogram(audio, output_dir=SPECTROGRAM_FOLDER):
     """
-    Reads a spectrogram image and extracts forensic metrics.
+    Forensic metrics computed on the STFT dB matrix of a file path or DecodedAudio.
+    Intensities are in dB relative to the recording's peak. Anomalies are connected
+    regions above config.SPECTRO_ANOMALY_DB; the highlighted image with their
+    bounding boxes is the only thing rendered.
     Returns a dictionary of values to add to the PDF.
     """
-    # Read image in grayscale
-    img = cv2.imread(spectrogram_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        raise FileNotFoundError(f"Spectrogram not found: {spectrogram_path}")
-
-    # Basic metrics
-    max_intensity = np.max(img)
-    mean_intensity = np.mean(img)
-    min_intensity = np.min(img)
-    std_intensity = np.std(img)
-
-    # Detect bright spots / anomalies
-    _, thresh = cv2.threshold(img, 200, 255, cv2.THRESH_BINARY)
-    anomaly_count = cv2.countNonZero(thresh)
-
-    # Highlight anomalies and save
-    img_color = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    for cnt in contours:
-        x, y, w, h = cv2.boundingRect(cnt)
-        cv2.rectangle(img_color, (x, y), (x + w, y + h), (0, 0, 255), 1)
-    highlighted_path = spectrogram_path.replace(".png", "_highlighted.png")
-    cv2.imwrite(highlighted_path, img_color)
+    S_db, sr, base_name = spectrogram_db(audio)
+    regions = find_anomaly_regions(S_db, sr)
+
+    highlighted_path = os.path.join(output_dir, f"{base_name}_{uuid.uuid4().hex[:8]}_highlighted.png")
+    boxes = [(r["start"], r["end"], r["low_hz"], r["high_hz"]) for r in regions[:config.SPECTRO_MAX_BOXES]]
+    save_spectrogram(highlighted_path, S_db, sr, hop_length=HOP_LENGTH, y_axis="log",
+                     title="Spectrogram Anomalies", boxes=boxes)
 
     # Return forensic info
     return {
-        "max_intensity": max_intensity,
-        "mean_intensity": mean_intensity,
-        "min_intensity": min_intensity,
-        "std_intensity": std_intensity,
-        "anomaly_count": anomaly_count,
+        "max_intensity": float(np.max(S_db)),
+        "mean_intensity": float(np.mean(S_db)),
+        "min_intensity": float(np.min(S_db)),
+        "std_intensity": float(np.std(S_db)),
+        "anomaly_count": len(regions),
+        "anomaly_cells": sum(r["cells"] for r in regions),
+        "anomaly_regions": regions[:config.SPECTRO_MAX_REGIONS],
+        "highlighted_path": highlighted_path
+    }
+
+
+def _region_dict(region, sr, hop_length=HOP_LENGTH, n_fft=N_FFT):
+    cells, low, high, start, stop, peak = region
+    return {
+        "start": round(start * hop_length / sr, 3),
+        "end": round(stop * hop_length / sr, 3),
+        "low_hz": round(low * sr / n_fft, 1),
+        "high_hz": round(high * sr / n_fft, 1),
+        "peak_db": round(float(peak), 2),
+        "cells": int(cells),
+    }
+
+
+def _merge(region, other):
+    """Fold other's [cells, low_row, high_row, start_frame, stop_frame, peak_db] into region."""
+    region[0] += other[0]
+    region[1], region[2] = min(region[1], other[1]), max(region[2], other[2])
+    region[3], region[4] = min(region[3], other[3]), max(region[4], other[4])
+    region[5] = max(region[5], other[5])
+
+
+def analyze_spectrogram_stream(file_path, output_dir=SPECTROGRAM_FOLDER,
+                               threshold_db=config.SPECTRO_ANOMALY_DB,
+                               min_cells=config.SPECTRO_ANOMALY_MIN_CELLS,
+                               block_frames=config.STREAM_STFT_BLOCK_FRAMES, image_width=1200):
+    """
+    analyze_spectrogram() for long recordings: the STFT is read in blocks (see
+    utils.streaming_stft) and never held in full. Each block is labelled with
+    the previous block's last frame prepended, so a region crossing a block edge
+    is joined with what it touched before; regions are final once a block no
+    longer extends them. Only the largest regions are kept. Returns the same keys.
+    """
+    sr = sf.info(file_path).samplerate
+    n_frames = frame_count(file_path, HOP_LENGTH)
+    if n_frames == 0:
+        raise ValueError(f"No audio frames in {file_path}")
+    n_bins = 1 + N_FFT // 2
+    max_power = max(float(power.max()) for power in stream_power_frames(file_path, N_FFT, HOP_LENGTH, block_frames))
+
+    db_stats = RunningStats()
+    max_db, min_db = -np.inf, np.inf
+    pooled = np.full((n_bins, min(image_width, n_frames)), -80.0, dtype=np.float32)
+    column_of = np.arange(n_frames) * pooled.shape[1] // n_frames
+
+    open_regions = {}  # region id -> [cells, low_row, high_row, start_frame, stop_frame, peak_db]
+    edge = np.zeros(n_bins, dtype=np.int64)  # open region id of each bin in the last frame seen
+    largest = []  # min-heap of (cells, id, region) over the closed regions
+    keep = max(config.SPECTRO_MAX_BOXES, config.SPECTRO_MAX_REGIONS)
+    count = total_cells = 0
+    next_id = 1
+
+    def close(region_id):
+        nonlocal count, total_cells
+        region = open_regions.pop(region_id)
+        if region[0] < min_cells:
+            return
+        count += 1
+        total_cells += region[0]
+        heapq.heappush(largest, (region[0], region_id, region))
+        if len(largest) > keep:
+            heapq.heappop(largest)
+
+    done = 0
+    for power in stream_power_frames(file_path, N_FFT, HOP_LENGTH, block_frames):
+        k = power.shape[1]
+        S_db = power_to_db(power, max_power)
+        db_stats.update(S_db)
+        max_db, min_db = max(max_db, float(S_db.max())), min(min_db, float(S_db.min()))
+        np.maximum.at(pooled.T, column_of[done:done + k], S_db.T)
+
+        labels, n = ndimage.label(np.concatenate([(edge > 0)[:, None], S_db > threshold_db], axis=1),
+                                  structure=_CONNECTIVITY)
+        body = labels[:, 1:]
+        cells = np.bincount(body.ravel(), minlength=n + 1)
+        peaks = ndimage.maximum(S_db, body, np.arange(1, n + 1)) if n else []
+
+        # Open regions each new label continues: (label, region id) pairs along the seam
+        seam = labels[:, 0] > 0
+        touched = {}
+        for label, region_id in set(zip(labels[seam, 0].tolist(), edge[seam].tolist())):
+            touched.setdefault(label, set()).add(region_id)
+
+        parent = {}
+
+        def root(region_id):
+            while region_id in parent:
+                region_id = parent[region_id]
+            return region_id
+
+        owner = np.zeros(n + 1, dtype=np.int64)
+        for label, box in enumerate(ndimage.find_objects(body, max_label=n), start=1):
+            if box is None:
+                continue  # only cells of the previous frame
+            rows, cols = box
+            region = [int(cells[label]), rows.start, rows.stop, done + cols.start, done + cols.stop,
+                      float(peaks[label - 1])]
+            roots = sorted({root(r) for r in touched.get(label, ())})
+            if roots:
+                region_id = roots[0]
+                for other in roots[1:]:
+                    _merge(open_regions[region_id], open_regions.pop(other))
+                    parent[other] = region_id
+                _merge(open_regions[region_id], region)
+            else:
+                region_id, next_id = next_id, next_id + 1
+                open_regions[region_id] = region
+            owner[label] = region_id
+
+        edge = np.array([root(r) for r in owner[body[:, -1]].tolist()], dtype=np.int64) if n else edge * 0
+        for region_id in set(open_regions) - set(edge.tolist()):
+            close(region_id)
+        done += k
+    for region_id in list(open_regions):
+        close(region_id)
+
+    regions = [_region_dict(region, sr) for _, _, region in sorted(largest, reverse=True)]
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    highlighted_path = os.path.join(output_dir, f"{base_name}_{uuid.uuid4().hex[:8]}_highlighted.png")
+    boxes = [(r["start"], r["end"], r["low_hz"], r["high_hz"]) for r in regions[:config.SPECTRO_MAX_BOXES]]
+    save_spectrogram(highlighted_path, pooled, sr, hop_length=HOP_LENGTH * n_frames / pooled.shape[1],
+                     y_axis="log", title="Spectrogram Anomalies", boxes=boxes)
+
+    return {
+        "max_intensity": max_db,
+        "mean_intensity": float(db_stats.mean),
+        "min_intensity": min_db,
+        "std_intensity": float(db_stats.std),
+        "anomaly_count": count,
+        "anomaly_cells": int(total_cells),
+        "anomaly_regions": regions[:config.SPECTRO_MAX_REGIONS],
         "highlighted_path": highlighted_path
     }
@@ -1,24 +1,40 @@
 import os
+import uuid
 import librosa
-import librosa.display
-import matplotlib.pyplot as plt
-import numpy as np
+from ..utils.audio_buffer import DecodedAudio
+from ..utils.spectral_features import SpectralFeatures, features_for
+from ..utils.spectrogram_render import save_spectrogram
 
 SPECTROGRAM_FOLDER = "reports/spectrograms"
 os.makedirs(SPECTROGRAM_FOLDER, exist_ok=True)
 
-def generate_spectrogram(file_path):
-    y, sr = librosa.load(file_path, sr=None)
-    plt.figure(figsize=(10, 4))
-    D = librosa.amplitude_to_db(abs(librosa.stft(y)), ref=np.max)
-    librosa.display.specshow(D, sr=sr, x_axis="time", y_axis="log")
-    plt.colorbar(format="%+2.0f dB")
-    plt.title("Spectrogram")
-    plt.tight_layout()
+N_FFT = 2048
+HOP_LENGTH = 512
 
-    base_name = os.path.splitext(os.path.basename(file_path))[0]
-    filename = f"{base_name}_spectrogram.png"
-    plt.savefig(os.path.join(SPECTROGRAM_FOLDER, filename))
-    plt.close()
+def spectrogram_db(file_path):
+    """
+    STFT magnitude in dB relative to its peak, for a file path or a DecodedAudio.
+    Returns (D, sr, base_name).
+    """
+    if isinstance(file_path, DecodedAudio):
+        # Shared with every other analysis of the same decoded upload
+        features = features_for(file_path, N_FFT, HOP_LENGTH)
+        base_name = file_path.name
+    else:
+        y, sr = librosa.load(file_path, sr=None)
+        features = SpectralFeatures(y, sr, N_FFT, HOP_LENGTH)
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+    return features.db, features.sr, base_name
+
+def generate_spectrogram(file_path, output_dir=SPECTROGRAM_FOLDER):
+    """
+    Accepts a file path or a DecodedAudio; saves the PNG in output_dir and
+    returns its (unique) filename.
+    """
+    D, sr, base_name = spectrogram_db(file_path)
+
+    filename = f"{base_name}_{uuid.uuid4().hex[:8]}_spectrogram.png"
+    save_spectrogram(os.path.join(output_dir, filename), D, sr, hop_length=HOP_LENGTH,
+                     y_axis="log", title="Spectrogram")
 
     return filename  # return only the filename
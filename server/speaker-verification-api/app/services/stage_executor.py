@@ -0,0 +1,127 @@
+# app/services/stage_executor.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .. import config
+
+# Concurrency limits are process-wide so that simultaneous reports share them.
+# Whisper installs kv-cache hooks on the shared model, so it must never run twice at once.
+_limits = {name: threading.BoundedSemaphore(count) for name, count in config.STAGE_CONCURRENCY_LIMITS.items()}
+_limits_lock = threading.Lock()
+
+
+def _limit(name):
+    with _limits_lock:
+        if name not in _limits:
+            _limits[name] = threading.BoundedSemaphore(1)
+        return _limits[name]
+
+
+class Stage:
+    """
+    One unit of work in a pipeline.
+    func is called as func(*args, *dependency_results) in the order deps are listed.
+    """
+
+    def __init__(self, name, func, args=(), deps=(), limit=None, executor="thread"):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.deps = tuple(deps)
+        self.limit = limit
+        self.executor = executor
+
+
+class StageResults:
+    """Per-stage results, errors and wall-clock timings from one pipeline run."""
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        self.timings = {}
+
+    def get(self, name, default=None):
+        return self.results.get(name, default)
+
+    def ok(self, name):
+        return name in self.results
+
+
+class StageExecutor:
+    """
+    Runs independent stages concurrently and starts each stage as soon as all of
+    its dependencies have finished. A failed stage fails its dependents too.
+    """
+
+    def __init__(self, max_workers=config.STAGE_THREAD_WORKERS, process_workers=config.STAGE_PROCESS_WORKERS):
+        self.max_workers = max_workers
+        self.process_workers = process_workers
+
+    @staticmethod
+    def _run_stage(stage, dep_values, process_pool):
+        start = time.perf_counter()
+        if stage.limit:
+            with _limit(stage.limit):
+                result = StageExecutor._call(stage, dep_values, process_pool)
+        else:
+            result = StageExecutor._call(stage, dep_values, process_pool)
+        return result, time.perf_counter() - start
+
+    @staticmethod
+    def _call(stage, dep_values, process_pool):
+        if stage.executor == "process":
+            # func and its arguments must be picklable
+            return process_pool.submit(stage.func, *stage.args, *dep_values).result()
+        return stage.func(*stage.args, *dep_values)
+
+    def run(self, stages):
+        stages = {stage.name: stage for stage in stages}
+        for stage in stages.values():
+            missing = [dep for dep in stage.deps if dep not in stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages {missing}")
+
+        outcome = StageResults()
+        pending = dict(stages)
+        running = {}
+
+        process_pool = None
+        if any(stage.executor == "process" for stage in stages.values()):
+            process_pool = ProcessPoolExecutor(max_workers=self.process_workers)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as pool:
+                while pending or running:
+                    progressed = True
+                    while progressed:  # repeat so failures cascade through whole chains
+                        progressed = False
+                        for name, stage in list(pending.items()):
+                            failed = [dep for dep in stage.deps if dep in outcome.errors]
+                            if failed:
+                                outcome.errors[name] = f"Skipped: dependency {failed[0]} failed"
+                            elif all(dep in outcome.results for dep in stage.deps):
+                                dep_values = [outcome.results[dep] for dep in stage.deps]
+                                running[pool.submit(self._run_stage, stage, dep_values, process_pool)] = name
+                            else:
+                                continue
+                            del pending[name]
+                            progressed = True
+
+                    if not running:
+                        if pending:
+                            raise ValueError(f"Dependency cycle between stages {sorted(pending)}")
+                        break
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        try:
+                            outcome.results[name], outcome.timings[name] = future.result()
+                        except Exception as e:
+                            outcome.errors[name] = str(e)
+        finally:
+            if process_pool is not None:
+                process_pool.shutdown()
+
+        return outcome
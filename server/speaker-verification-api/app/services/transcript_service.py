@@ -1,35 +1,228 @@
 # app/services/transcript_service.py
 
+import threading
+
+import torch
 import whisper
-from difflib import SequenceMatcher
+from ..utils.audio_buffer import load_audio
+from ..utils.vad import speech_regions, chunk_regions
+from ..utils.word_diff import tokenize, diff_words
+
+from .. import config
+from .result_cache import cached_result
+from .model_registry import models
+
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE
+
+# Whisper installs kv-cache hooks on the model while decoding, so decodes must not
+# overlap. Held here rather than only in StageExecutor so that every caller
+# (/transcript-compare, reference enrolment, threaded workers) is serialised.
+_decode_lock = threading.Lock()
+
+# One registry entry per size; only the default is preloaded, the others load on first request
+for _size in config.WHISPER_MODEL_SIZES:
+    models.register(
+        f"whisper-{_size}",
+        lambda size=_size: whisper.load_model(size),
+        preload=(_size == config.WHISPER_MODEL),
+    )
+
+
+def _resolve_model_size(model_size):
+    model_size = model_size or config.WHISPER_MODEL
+    if model_size not in config.WHISPER_MODEL_SIZES:
+        raise ValueError(f"Unsupported Whisper model size '{model_size}'")
+    return model_size
+
+
+def _speech_chunks(samples):
+    """VAD speech regions grouped into chunks that fit Whisper's 30 s window."""
+    return chunk_regions(speech_regions(samples, SAMPLE_RATE), whisper.audio.N_SAMPLES)
+
+
+def _decode_chunks(model, pieces):
+    """
+    Decode a list of <=30 s sample arrays in batches of WHISPER_BATCH_SIZE.
+    Each batch is one stacked log-mel tensor through the encoder and batched
+    greedy decoding. Returns one text per piece ("" for non-speech).
+    """
+    options = whisper.DecodingOptions(
+        language=config.WHISPER_LANGUAGE,
+        without_timestamps=True,
+        fp16=model.device.type == "cuda",
+    )
+    texts = []
+    for i in range(0, len(pieces), config.WHISPER_BATCH_SIZE):
+        # Mel per piece: log_mel_spectrogram clamps against the batch maximum
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(piece), n_mels=model.dims.n_mels)
+            for piece in pieces[i:i + config.WHISPER_BATCH_SIZE]
+        ]).to(model.device)
+        with _decode_lock:
+            results = whisper.decode(model, mel, options)
+        for result in results:
+            # Same silence heuristic as whisper.transcribe
+            if result.no_speech_prob > 0.6 and result.avg_logprob < -1.0:
+                texts.append("")
+            else:
+                texts.append(result.text.strip())
+    return texts
+
+
+def _stitch(chunks, texts, model_size):
+    segments = [
+        {"start": round(start / SAMPLE_RATE, 2), "end": round(end / SAMPLE_RATE, 2), "text": text}
+        for (start, end), text in zip(chunks, texts)
+        if text
+    ]
+    return {
+        "text": " ".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "model": model_size,
+    }
+
+
+@cached_result("transcribe:whisper-vad", version=1)
+def _transcribe(audio, model_size):
+    samples = load_audio(audio).samples
+    chunks = _speech_chunks(samples)
+    if not chunks:
+        return _stitch([], [], model_size)
+    model = models.get(f"whisper-{model_size}")
+    texts = _decode_chunks(model, [samples[start:end] for start, end in chunks])
+    return _stitch(chunks, texts, model_size)
 
-# Load Whisper model once
-model = whisper.load_model("small")  # tiny / base / small / medium
 
-def transcribe_audio(file_path):
+def transcribe_detailed(audio, model_size=None):
+    """
+    Transcribe a file path or DecodedAudio with timestamps.
+    Silence is cut out by VAD, speech is packed into <=30 s chunks and the chunks
+    are decoded in batches. Returns {"text", "segments": [{"start", "end", "text"}], "model"}.
+    """
+    return _transcribe(audio, model_size=_resolve_model_size(model_size))
+
+
+@cached_result("transcribe-pair:whisper-vad", version=1)
+def _transcribe_pair(original, suspected, model_size):
+    original_samples = load_audio(original).samples
+    suspected_samples = load_audio(suspected).samples
+    original_chunks = _speech_chunks(original_samples)
+    suspected_chunks = _speech_chunks(suspected_samples)
+
+    pieces = [original_samples[start:end] for start, end in original_chunks]
+    pieces += [suspected_samples[start:end] for start, end in suspected_chunks]
+    texts = _decode_chunks(models.get(f"whisper-{model_size}"), pieces) if pieces else []
+
+    split = len(original_chunks)
+    return (
+        _stitch(original_chunks, texts[:split], model_size),
+        _stitch(suspected_chunks, texts[split:], model_size),
+    )
+
+
+def transcribe_pair(original, suspected, model_size=None):
+    """
+    Transcribe two recordings together. The speech chunks of both inputs share
+    padded batches through the encoder and decoder, so a comparison costs about
+    one transcription's worth of model calls instead of two.
+    Returns (original_detail, suspected_detail), each shaped like transcribe_detailed().
+    """
+    return _transcribe_pair(original, suspected, model_size=_resolve_model_size(model_size))
+
+
+def transcribe_audio(file_path, model_size=None):
     """
     Convert audio to text using Whisper.
+    Accepts a file path or a DecodedAudio; model_size picks tiny/base/small/medium.
     """
-    result = model.transcribe(file_path)
-    return result["text"]
+    return transcribe_detailed(file_path, model_size)["text"]
+
+def _word_times(segments):
+    """(start, end) per token, interpolated evenly within each Whisper segment."""
+    times = []
+    for segment in segments:
+        words = tokenize(segment["text"])
+        step = (segment["end"] - segment["start"]) / max(len(words), 1)
+        times += [
+            (round(segment["start"] + i * step, 2), round(segment["start"] + (i + 1) * step, 2))
+            for i in range(len(words))
+        ]
+    return times
+
+
+def _span_times(times, i1, i2):
+    if not times:
+        return None
+    if i2 > i1:
+        return {"start": times[i1][0], "end": times[i2 - 1][1]}
+    # Pure insertion/deletion on the other side: point at the neighbouring word
+    anchor = times[min(i1, len(times) - 1)]
+    return {"start": anchor[0], "end": anchor[0]}
 
-def compare_transcripts(original_text, suspected_text):
+
+def compare_transcripts(original_text, suspected_text, original_segments=None, suspected_segments=None):
     """
-    Compare reference transcript vs suspected audio transcript.
+    Compare reference transcript vs suspected audio transcript word by word.
     Returns:
         - similarity score (0-100%)
-        - mismatches (words / sentences)
+        - mismatches (summary sentence, empty when the transcripts agree)
+        - WER-style counts and the exact substituted / deleted / inserted spans,
+          with times when Whisper segments are passed in
     """
-    matcher = SequenceMatcher(None, original_text, suspected_text)
-    similarity = matcher.ratio() * 100  # percent similarity
+    original_words = tokenize(original_text)
+    suspected_words = tokenize(suspected_text)
+    opcodes = diff_words(original_words, suspected_words, max_edits=config.TRANSCRIPT_ALIGN_MAX_EDITS)
+
+    original_times = _word_times(original_segments) if original_segments else []
+    suspected_times = _word_times(suspected_segments) if suspected_segments else []
+    if len(original_times) != len(original_words):
+        original_times = []
+    if len(suspected_times) != len(suspected_words):
+        suspected_times = []
+
+    matches = substitutions = deletions = insertions = 0
+    differences = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            matches += i2 - i1
+            continue
+        substituted = min(i2 - i1, j2 - j1)
+        substitutions += substituted
+        deletions += (i2 - i1) - substituted
+        insertions += (j2 - j1) - substituted
+        differences.append({
+            "type": {"replace": "substitute", "delete": "delete", "insert": "insert"}[tag],
+            "original": " ".join(original_words[i1:i2]),
+            "suspected": " ".join(suspected_words[j1:j2]),
+            "original_word_index": i1,
+            "suspected_word_index": j1,
+            "original_time": _span_times(original_times, i1, i2),
+            "suspected_time": _span_times(suspected_times, j1, j2),
+        })
+
+    total = len(original_words) + len(suspected_words)
+    similarity = 2.0 * matches / total * 100 if total else 100.0  # percent similarity
+    errors = substitutions + deletions + insertions
+    wer = errors / len(original_words) if original_words else float(bool(suspected_words))
 
     # Detect if significant mismatches exist
     mismatches = ""
     if similarity < 95:  # configurable threshold
-        mismatches = "Key mismatches in words, tone, or pacing detected"
+        mismatches = (
+            f"{substitutions} substituted, {deletions} deleted and {insertions} inserted words "
+            f"across {len(differences)} locations"
+        )
 
     return {
         "similarity_score": round(similarity, 2),
         "mismatches": mismatches,
-        "suspected_transcript": suspected_text
+        "suspected_transcript": suspected_text,
+        "wer": round(wer, 4),
+        "substitutions": substitutions,
+        "deletions": deletions,
+        "insertions": insertions,
+        "original_word_count": len(original_words),
+        "suspected_word_count": len(suspected_words),
+        "differences": differences[:config.TRANSCRIPT_MAX_DIFFERENCES],
+        "differences_truncated": len(differences) > config.TRANSCRIPT_MAX_DIFFERENCES,
     }
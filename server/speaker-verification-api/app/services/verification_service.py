@@ -1,13 +1,25 @@
 import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import torch
 from werkzeug.utils import secure_filename
 from speechbrain.inference.speaker import SpeakerRecognition
 from .. import config
-from ..utils.audio_converter import convert_to_wav
+from ..utils.audio_buffer import DecodedAudio, load_audio
+from ..utils.workspace import Workspace
+from .result_cache import cached_result, content_hash
+from .model_registry import models
 
-verification = SpeakerRecognition.from_hparams(
-    source=config.MODEL_SOURCE,
-    savedir=config.MODEL_SAVEDIR
-)
+
+def _load_verification():
+    return SpeakerRecognition.from_hparams(
+        source=config.MODEL_SOURCE,
+        savedir=config.MODEL_SAVEDIR
+    )
+
+
+models.register("ecapa", _load_verification)
 
 ALLOWED_EXTENSIONS = {"wav", "mp3", "flac", "ogg", "m4a"}
 
@@ -23,48 +35,126 @@ def _allowed_file(file_or_path):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def _embed(audio):
+    """L2-normalised ECAPA embedding of a DecodedAudio as a 1-D float32 array."""
+    signal = torch.from_numpy(audio.samples).unsqueeze(0)
+    embedding = models.get("ecapa").encode_batch(signal)
+    embedding = embedding.squeeze().detach().cpu().numpy().astype(np.float32)
+    return embedding / (np.linalg.norm(embedding) + 1e-10)
+
+
+def _check_type(file_or_audio):
+    if isinstance(file_or_audio, DecodedAudio):
+        return
+    if not _allowed_file(file_or_audio):
+        allowed = list(ALLOWED_EXTENSIONS)
+        raise ValueError(f"Invalid file type. Allowed types are {allowed}")
+
+
+class EmbeddingCache:
+    """
+    Speaker embeddings keyed by audio content hash.
+    Held in a small in-memory LRU and persisted as float16 .npy files,
+    so a reference recording is only ever run through ECAPA once.
+    """
+
+    def __init__(self, cache_dir=config.EMBEDDING_CACHE_DIR, memory_items=config.EMBEDDING_CACHE_MEMORY_ITEMS):
+        self.cache_dir = os.path.join(cache_dir, secure_filename(config.MODEL_SOURCE))
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def _remember(self, key, embedding):
+        with self._lock:
+            self._memory[key] = embedding
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        try:
+            embedding = np.load(self._path(key)).astype(np.float32)
+        except (OSError, ValueError):
+            return None
+        embedding /= np.linalg.norm(embedding) + 1e-10
+        self._remember(key, embedding)
+        return embedding
+
+    def put(self, key, embedding):
+        self._remember(key, embedding)
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, embedding.astype(np.float16))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Embedding cache write failed: {e}")
+
+    def embedding_for(self, file_or_audio):
+        """Return the cached embedding for a recording, computing it on a miss."""
+        if not isinstance(file_or_audio, DecodedAudio) and not os.path.isfile(file_or_audio):
+            raise FileNotFoundError(f"Audio file not found: {file_or_audio}")
+        key = content_hash(file_or_audio)
+        embedding = self.get(key)
+        if embedding is None:
+            embedding = _embed(load_audio(file_or_audio))
+            self.put(key, embedding)
+        return embedding
+
+
+embedding_cache = EmbeddingCache()
+
+
+@cached_result(f"verify:{config.MODEL_SOURCE}", version=1)
 def process_and_verify_files(file1, file2):
     """
-    Accepts either Flask FileStorage objects OR string file paths.
-    Converts both to wav and verifies speakers.
+    Accepts Flask FileStorage objects, string file paths or DecodedAudio.
+    Embeds both recordings and verifies speakers.
     """
 
-    # 🔹 Handle FileStorage objects
+    # 🔹 Handle FileStorage objects (saved to a private workspace, removed afterwards)
     if hasattr(file1, "save") and hasattr(file2, "save"):
-        filename1 = secure_filename(file1.filename)
-        filename2 = secure_filename(file2.filename)
-
-        original_path1 = os.path.join(config.UPLOAD_FOLDER, filename1)
-        original_path2 = os.path.join(config.UPLOAD_FOLDER, filename2)
+        with Workspace() as workspace:
+            original_path1 = workspace.file(secure_filename(file1.filename))
+            original_path2 = workspace.file(secure_filename(file2.filename))
 
-        file1.save(original_path1)
-        file2.save(original_path2)
+            file1.save(original_path1)
+            file2.save(original_path2)
+            return process_and_verify_files(original_path1, original_path2)
 
-    # 🔹 Handle string paths (already saved)
+    # 🔹 Handle string paths (already saved) or decoded audio
     else:
         original_path1 = file1
         original_path2 = file2
 
-    if not (_allowed_file(original_path1) and _allowed_file(original_path2)):
-        allowed = list(ALLOWED_EXTENSIONS)
-        raise ValueError(f"Invalid file type. Allowed types are {allowed}")
+    _check_type(original_path1)
+    _check_type(original_path2)
+
+    # Run speaker verification (same cosine scoring as SpeakerRecognition.verify_files)
+    embedding1 = embedding_cache.embedding_for(original_path1)
+    embedding2 = embedding_cache.embedding_for(original_path2)
+    score = float(np.dot(embedding1, embedding2))
+
+    return {
+        "score": score,
+        "same_speaker": bool(score > config.VERIFICATION_THRESHOLD),
+    }
 
-    wav_path1, wav_path2 = None, None
-    try:
-        # Convert both to wav for consistency
-        wav_path1 = convert_to_wav(original_path1)
-        wav_path2 = convert_to_wav(original_path2)
-
-        # Run speaker verification
-        score, prediction = verification.verify_files(wav_path1, wav_path2)
-
-        return {
-            "score": float(score[0]),
-            "same_speaker": bool(prediction[0]),
-        }
-
-    finally:
-        # Clean up temporary wavs only
-        for path in [wav_path1, wav_path2]:
-            if path and os.path.exists(path):
-                os.remove(path)
+
+def compute_embedding(file_or_audio):
+    """
+    Compute the L2-normalised ECAPA speaker embedding for one recording.
+    Returns a 1-D float32 NumPy array, served from the embedding cache when
+    the same audio content has been embedded before.
+    """
+    _check_type(file_or_audio)
+    return embedding_cache.embedding_for(file_or_audio)
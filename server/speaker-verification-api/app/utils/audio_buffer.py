@@ -0,0 +1,61 @@
+# app/utils/audio_buffer.py
+import os
+import numpy as np
+
+from .audio_converter import decode_audio
+
+TARGET_SAMPLE_RATE = 16000
+
+
+class DecodedAudio:
+    """
+    An upload decoded once to 16 kHz mono float32, shared by every analysis service.
+    Keeps the source path and container metadata for hashing and reporting.
+    """
+
+    def __init__(self, samples, sample_rate=TARGET_SAMPLE_RATE, source_path=None,
+                 source_sample_rate=None, source_channels=None, file_size=None):
+        self.samples = np.ascontiguousarray(samples, dtype=np.float32)
+        self.sample_rate = int(sample_rate)
+        self.source_path = source_path
+        self.source_sample_rate = int(source_sample_rate or sample_rate)
+        self.source_channels = int(source_channels or 1)
+        self.file_size = file_size
+        self.sha256 = None  # content hash of the source file, filled in on first use
+        self.feature_cache = {}  # SpectralFeatures per (n_fft, hop_length), see features_for()
+
+    @classmethod
+    def from_file(cls, file_path, sample_rate=TARGET_SAMPLE_RATE):
+        """Decode an audio file to mono float32 at sample_rate."""
+        samples, source_sample_rate, source_channels = decode_audio(file_path, sample_rate)
+        return cls(
+            samples,
+            sample_rate=sample_rate,
+            source_path=file_path,
+            source_sample_rate=source_sample_rate,
+            source_channels=source_channels,
+            file_size=os.path.getsize(file_path),
+        )
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def name(self):
+        if self.source_path:
+            return os.path.splitext(os.path.basename(self.source_path))[0]
+        return "audio"
+
+    def __len__(self):
+        return len(self.samples)
+
+
+def load_audio(audio, sample_rate=TARGET_SAMPLE_RATE):
+    """
+    Accepts either a DecodedAudio or a file path and returns a DecodedAudio.
+    Already-decoded audio is passed through untouched.
+    """
+    if isinstance(audio, DecodedAudio):
+        return audio
+    return DecodedAudio.from_file(audio, sample_rate=sample_rate)
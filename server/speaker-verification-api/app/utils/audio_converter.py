@@ -1,15 +1,126 @@
+import os
+import shutil
+import tempfile
 import ffmpeg
+import numpy as np
+import soundfile as sf
+import soxr
 
-def convert_to_wav(source_path, sample_rate=16000):
-    wav_path = source_path.rsplit('.', 1)[0] + "_converted.wav"
+STREAM_BLOCK_FRAMES = 1 << 18  # ~5.5 s at 48 kHz per decoded block
+
+
+def _ffmpeg_decode(source_path, sample_rate):
+    """
+    Decode through an ffmpeg pipe for containers libsndfile cannot read (mp4, m4a, ...).
+    Output is mono float32 at sample_rate; nothing is written to disk.
+    """
+    try:
+        out, _ = (
+            ffmpeg
+            .input(source_path)
+            .output("pipe:", format="f32le", acodec="pcm_f32le", ac=1, ar=sample_rate)
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        raise IOError(f"FFmpeg decoding failed: {e.stderr.decode()}") from e
+    return np.frombuffer(out, dtype=np.float32).copy()
+
+
+def decode_audio(source_path, sample_rate=16000):
+    """
+    Decode an audio file to mono float32 at sample_rate, in-process where possible.
+    WAV/FLAC/OGG/MP3 are read by soundfile and resampled with soxr; anything else
+    falls back to ffmpeg. Returns (samples, source_sample_rate, source_channels);
+    the source values are None when only ffmpeg could read the file.
+    """
+    try:
+        data, source_sr = sf.read(source_path, dtype="float32", always_2d=True)
+    except RuntimeError:
+        return _ffmpeg_decode(source_path, sample_rate), None, None
+
+    channels = data.shape[1]
+    samples = data[:, 0] if channels == 1 else data.mean(axis=1)
+    if source_sr != sample_rate:
+        samples = soxr.resample(samples, source_sr, sample_rate, quality="HQ")
+    return np.ascontiguousarray(samples, dtype=np.float32), source_sr, channels
+
+
+def is_pcm_wav(source_path, sample_rate=16000):
+    """True when the file is already a mono 16-bit PCM WAV at sample_rate."""
+    try:
+        info = sf.info(source_path)
+    except RuntimeError:
+        return False
+    return (
+        info.format == "WAV"
+        and info.subtype == "PCM_16"
+        and info.channels == 1
+        and info.samplerate == sample_rate
+    )
+
+
+def _ffmpeg_to_wav(source_path, output_path, sample_rate):
     try:
         (
             ffmpeg
             .input(source_path)
-            .output(wav_path, ac=1, ar=sample_rate, format="wav")
+            .output(output_path, ac=1, ar=sample_rate, acodec="pcm_s16le", format="wav")
             .overwrite_output()
             .run(quiet=True)
         )
-        return wav_path
     except ffmpeg.Error as e:
         raise IOError(f"FFmpeg conversion failed: {e.stderr.decode()}") from e
+
+
+def normalize_to_wav(source_path, output_path, sample_rate=16000, move=False, block_size=STREAM_BLOCK_FRAMES):
+    """
+    Write source_path as a mono 16-bit WAV at sample_rate to output_path.
+    Files that already match are copied (or moved, with move=True) without decoding.
+    Others are decoded and resampled block by block, so memory stays bounded
+    however long the recording is.
+    """
+    if is_pcm_wav(source_path, sample_rate):
+        if os.path.abspath(source_path) != os.path.abspath(output_path):
+            if move:
+                os.replace(source_path, output_path)
+            else:
+                shutil.copyfile(source_path, output_path)
+        return output_path
+
+    try:
+        src = sf.SoundFile(source_path)
+    except RuntimeError:
+        _ffmpeg_to_wav(source_path, output_path, sample_rate)
+        return output_path
+
+    with src, sf.SoundFile(output_path, "w", samplerate=sample_rate, channels=1,
+                           subtype="PCM_16", format="WAV") as dst:
+        resampler = None
+        if src.samplerate != sample_rate:
+            resampler = soxr.ResampleStream(src.samplerate, sample_rate, 1, dtype="float32", quality="HQ")
+        for block in src.blocks(blocksize=block_size, dtype="float32", always_2d=True):
+            mono = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+            if resampler is not None:
+                mono = resampler.resample_chunk(np.ascontiguousarray(mono, dtype=np.float32))
+            dst.write(mono)
+        if resampler is not None:
+            dst.write(resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+    return output_path
+
+
+def convert_to_wav(source_path, sample_rate=16000):
+    """
+    Return a mono PCM WAV at sample_rate for source_path.
+    Already-conforming files are returned as-is (callers must not delete the
+    result when it equals source_path); others are converted in-process.
+    """
+    if is_pcm_wav(source_path, sample_rate):
+        return source_path
+    # Unique name next to the source, so concurrent conversions never collide
+    fd, wav_path = tempfile.mkstemp(
+        prefix=os.path.splitext(os.path.basename(source_path))[0] + "_",
+        suffix="_converted.wav",
+        dir=os.path.dirname(source_path) or ".",
+    )
+    os.close(fd)
+    return normalize_to_wav(source_path, wav_path, sample_rate)
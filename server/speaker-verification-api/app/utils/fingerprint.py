@@ -0,0 +1,69 @@
+# app/utils/fingerprint.py
+import numpy as np
+from scipy import ndimage
+
+from .. import config
+
+# Hash layout: anchor frequency (9 bits) | frequency delta + 128 (8 bits) | time delta (6 bits)
+_FREQ_BITS, _DELTA_BITS, _DT_BITS = 9, 8, 6
+_MAX_PAIR_SEARCH = 64  # later peaks examined per anchor
+
+
+def find_peaks(S_db, sr, hop_length, neighborhood=config.FINGERPRINT_NEIGHBORHOOD,
+               min_db=config.FINGERPRINT_MIN_PEAK_DB, margin_db=config.FINGERPRINT_PEAK_MARGIN_DB,
+               per_second=config.FINGERPRINT_PEAKS_PER_SECOND):
+    """
+    Spectral landmarks of a dB spectrogram (bins x frames, 0 dB = peak): points
+    that are the maximum of their neighbourhood, above min_db and margin_db above
+    their frequency's median level (the stationary background), thinned to the
+    per_second strongest in each second. Returns (frames, bins), sorted by time.
+    """
+    # Bin 0 and anything above 1023 do not fit the 9-bit quantised frequency
+    S = S_db[:min(S_db.shape[0], 1 << (_FREQ_BITS + 1))]
+    floor = np.maximum(np.median(S, axis=1, keepdims=True) + margin_db, min_db)
+    local_max = (S == ndimage.maximum_filter(S, size=neighborhood, mode="constant", cval=-np.inf)) & (S > floor)
+    local_max[0] = False
+    bins, frames = np.nonzero(local_max)
+    if len(frames) == 0:
+        return frames, bins
+
+    # Keep the strongest peaks in each second: rank within (second, -magnitude) order
+    second = frames * hop_length // sr
+    order = np.lexsort((-S[bins, frames], second))
+    second = second[order]
+    group_start = np.flatnonzero(np.r_[True, second[1:] != second[:-1]])
+    rank = np.arange(len(order)) - np.repeat(group_start, np.diff(np.r_[group_start, len(order)]))
+    keep = order[rank < per_second]
+
+    frames, bins = frames[keep], bins[keep]
+    by_time = np.lexsort((bins, frames))
+    return frames[by_time], bins[by_time]
+
+
+def landmark_hashes(frames, bins, fan_out=config.FINGERPRINT_FAN_OUT,
+                    max_dt=config.FINGERPRINT_MAX_DT, max_df=config.FINGERPRINT_MAX_DF):
+    """
+    Pair each peak with the next fan_out peaks inside its target zone
+    (1..max_dt frames later, within max_df quantised bins) and pack each pair
+    into an integer hash. Returns (hashes, anchor_frames) as int64 arrays.
+    """
+    n = len(frames)
+    quantised = bins.astype(np.int64) >> 1
+    taken = np.zeros(n, dtype=np.int64)
+    anchors, hashes = [], []
+    for k in range(1, min(n, _MAX_PAIR_SEARCH + 1)):
+        i = np.arange(n - k)
+        j = i + k
+        dt = frames[j] - frames[i]
+        if not np.any(dt <= max_dt):
+            break  # peaks are time-ordered: every later pair is out of range too
+        df = quantised[j] - quantised[i]
+        valid = (dt >= 1) & (dt <= max_dt) & (np.abs(df) <= max_df) & (taken[i] < fan_out)
+        i, dt, df = i[valid], dt[valid], df[valid]
+        taken[i] += 1
+        anchors.append(i)
+        hashes.append((quantised[i] << (_DELTA_BITS + _DT_BITS)) | ((df + 128) << _DT_BITS) | dt)
+    if not anchors:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    anchors = np.concatenate(anchors)
+    return np.concatenate(hashes).astype(np.int64), frames[anchors].astype(np.int64)
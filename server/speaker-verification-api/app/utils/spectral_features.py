@@ -0,0 +1,95 @@
+# app/utils/spectral_features.py
+import threading
+
+import librosa
+import numpy as np
+
+from .audio_buffer import DecodedAudio
+
+
+class SpectralFeatures:
+    """
+    Spectral features of one signal, all derived from a single power STFT.
+    Each feature is computed on first access and memoised, so services that
+    share an instance (see features_for) never repeat an STFT.
+    """
+
+    def __init__(self, y, sr, n_fft=2048, hop_length=512, n_mels=40):
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self._values = {}
+        self._lock = threading.RLock()  # features are computed from other features
+
+    def _memo(self, name, compute):
+        value = self._values.get(name)
+        if value is None:
+            with self._lock:
+                value = self._values.get(name)
+                if value is None:
+                    value = compute()
+                    self._values[name] = value
+        return value
+
+    @property
+    def power(self):
+        """|STFT|^2, (1 + n_fft/2) x frames."""
+        return self._memo("power", lambda: np.abs(
+            librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length)) ** 2)
+
+    @property
+    def magnitude(self):
+        return self._memo("magnitude", lambda: np.sqrt(self.power))
+
+    @property
+    def db(self):
+        """Magnitude in dB relative to the peak; same as amplitude_to_db(|S|, ref=np.max)."""
+        return self._memo("db", lambda: librosa.power_to_db(self.power, ref=np.max))
+
+    @property
+    def flatness(self):
+        return self._memo("flatness", lambda: librosa.feature.spectral_flatness(S=self.magnitude, power=2.0))
+
+    @property
+    def entropy(self):
+        """Spectral entropy (bits) per frame."""
+        def compute():
+            ps = self.power
+            ps_norm = ps / (np.sum(ps, axis=0, keepdims=True) + 1e-8)
+            return -np.sum(ps_norm * np.log2(ps_norm + 1e-8), axis=0)
+        return self._memo("entropy", compute)
+
+    @property
+    def mel_db(self):
+        def compute():
+            mel = librosa.feature.melspectrogram(S=self.power, sr=self.sr, n_mels=self.n_mels)
+            return librosa.power_to_db(mel, ref=np.max)
+        return self._memo("mel_db", compute)
+
+    @property
+    def rms(self):
+        """
+        Frame RMS from the spectrum (Parseval), one value per STFT frame.
+        Divided by the Hann window's RMS so levels match time-domain librosa.feature.rms(y=...).
+        """
+        def compute():
+            window_rms = np.sqrt(np.mean(librosa.filters.get_window("hann", self.n_fft, fftbins=True) ** 2))
+            return librosa.feature.rms(S=self.magnitude, frame_length=self.n_fft)[0] / window_rms
+        return self._memo("rms", compute)
+
+
+def features_for(audio, n_fft=2048, hop_length=512):
+    """
+    The SpectralFeatures of a DecodedAudio, created once and kept on the object,
+    so every analysis of the same decoded upload shares one STFT.
+    """
+    if not isinstance(audio, DecodedAudio):
+        raise TypeError("features_for() expects a DecodedAudio")
+    key = (n_fft, hop_length)
+    features = audio.feature_cache.get(key)
+    if features is None:
+        features = audio.feature_cache.setdefault(
+            key, SpectralFeatures(audio.samples, audio.sample_rate, n_fft, hop_length))
+    return features
@@ -0,0 +1,175 @@
+# app/utils/spectrogram_render.py
+import functools
+import io
+
+import numpy as np
+from matplotlib import colormaps  # colormap data only; pyplot is never imported
+from PIL import Image, ImageDraw, ImageFont
+
+_MARGIN_LEFT = 60
+_MARGIN_RIGHT = 80
+_MARGIN_TOP = 28
+_MARGIN_BOTTOM = 36
+_COLORBAR_WIDTH = 14
+_LOG_FMIN = 20.0  # bottom of the log frequency axis
+
+# Images are palette PNGs: indices below _LEVELS are colormap steps, the rest are ink
+_LEVELS = 252
+_WHITE, _BLACK, _BOX = 252, 253, 254
+
+
+@functools.lru_cache(maxsize=None)
+def colormap_lut(name="magma"):
+    """
+    256 x 3 uint8 palette for a matplotlib colormap, built once per name:
+    _LEVELS colormap steps followed by white, black and the box colour.
+    """
+    rgba = colormaps[name](np.linspace(0.0, 1.0, _LEVELS))
+    lut = np.zeros((256, 3), dtype=np.uint8)
+    lut[:_LEVELS] = np.round(rgba[:, :3] * 255)
+    lut[_WHITE] = (255, 255, 255)
+    lut[_BOX] = (0, 255, 255)
+    lut.setflags(write=False)
+    return lut
+
+
+def _row_index(n_bins, height, sr, y_axis):
+    """Spectrogram row to sample for each output pixel row, top row = highest frequency."""
+    if y_axis == "log":
+        nyquist = sr / 2.0
+        hz_per_bin = nyquist / (n_bins - 1)
+        freqs = np.geomspace(_LOG_FMIN, nyquist, height)
+        rows = np.clip(np.round(freqs / hz_per_bin).astype(int), 0, n_bins - 1)
+    else:
+        rows = np.linspace(0, n_bins - 1, height).round().astype(int)
+    return rows[::-1]
+
+
+def _resample_columns(S, width):
+    """Fit the time axis to width pixels; peaks are kept when frames are pooled."""
+    n_frames = S.shape[1]
+    if n_frames > width:
+        edges = np.linspace(0, n_frames, width + 1).astype(int)[:-1]
+        return np.maximum.reduceat(S, edges, axis=1)
+    return S[:, np.linspace(0, n_frames - 1, width).round().astype(int)]
+
+
+def _freq_label(hz):
+    return f"{hz / 1000:g}k" if hz >= 1000 else f"{hz:g}"
+
+
+def _draw_axes(canvas, plot_box, duration, sr, y_axis, vmin, vmax, title):
+    draw = ImageDraw.Draw(canvas)
+    draw.fontmode = "1"  # no anti-aliasing: blending palette indices is meaningless
+    font = ImageFont.load_default()
+    left, top, right, bottom = plot_box
+    width, height = right - left, bottom - top
+    draw.rectangle([left - 1, top - 1, right, bottom], outline=_BLACK)
+
+    # Time ticks
+    for t in np.linspace(0, duration, 6):
+        x = left + int(round(t / max(duration, 1e-9) * (width - 1)))
+        draw.line([x, bottom, x, bottom + 4], fill=_BLACK)
+        draw.text((x, bottom + 6), f"{t:.1f}", fill=_BLACK, font=font, anchor="mt")
+    draw.text((left + width // 2, bottom + 20), "Time (s)", fill=_BLACK, font=font, anchor="mt")
+
+    # Frequency ticks
+    nyquist = sr / 2.0
+    if y_axis == "log":
+        ticks = [f for f in (100, 250, 500, 1000, 2000, 4000, 8000, 16000) if _LOG_FMIN <= f <= nyquist]
+        lo = np.log(_LOG_FMIN)
+        position = [(np.log(f) - lo) / (np.log(nyquist) - lo) for f in ticks]
+    else:
+        ticks = list(np.linspace(0, nyquist, 5))
+        position = [f / nyquist for f in ticks]
+    for f, p in zip(ticks, position):
+        y = bottom - 1 - int(round(p * (height - 1)))
+        draw.line([left - 5, y, left - 1, y], fill=_BLACK)
+        draw.text((left - 7, y), _freq_label(f), fill=_BLACK, font=font, anchor="rm")
+    draw.text((4, top - 18), "Hz", fill=_BLACK, font=font)
+
+    # Colour bar with dB labels
+    bar_left = right + 12
+    gradient = np.linspace(_LEVELS - 1, 0, height).astype(np.uint8)
+    bar = np.repeat(gradient[:, None], _COLORBAR_WIDTH, axis=1)
+    canvas.paste(Image.fromarray(bar, "L"), (bar_left, top))
+    draw.rectangle([bar_left - 1, top - 1, bar_left + _COLORBAR_WIDTH, bottom], outline=_BLACK)
+    for db in np.linspace(vmax, vmin, 5):
+        y = top + int(round((vmax - db) / (vmax - vmin) * (height - 1)))
+        draw.text((bar_left + _COLORBAR_WIDTH + 4, y), f"{db:+.0f} dB", fill=_BLACK, font=font, anchor="lm")
+
+    if title:
+        draw.text((left + width // 2, 8), title, fill=_BLACK, font=font, anchor="mt")
+
+
+def render_spectrogram(S_db, sr, hop_length=512, width=1000, height=400, vmin=-80.0, vmax=0.0,
+                       cmap="magma", y_axis="linear", axes=True, title="Spectrogram", boxes=None):
+    """
+    Render a (freq_bins x frames) dB matrix to PNG bytes without matplotlib figures.
+    Values are quantised to 252 levels and written as a palette PNG whose
+    palette is a cached colormap lookup table, so no RGB image is built.
+    width/height are the full image size; with axes=True the plot area is
+    inset to leave room for time/frequency ticks and a colour bar.
+    boxes is an optional list of (t0, t1, f0, f1) rectangles in seconds and Hz
+    to outline. Uses only per-call objects, so it is safe to call from many threads.
+    Raises ValueError unless vmin < vmax.
+    """
+    if not vmax > vmin:
+        raise ValueError(f"vmax ({vmax}) must be greater than vmin ({vmin})")
+    S_db = np.asarray(S_db, dtype=np.float32)
+    if S_db.ndim != 2 or S_db.shape[1] == 0:
+        S_db = np.full((max(S_db.shape[0], 2) if S_db.ndim else 2, 1), vmin, dtype=np.float32)
+    lut = colormap_lut(cmap)
+    duration = S_db.shape[1] * hop_length / sr
+
+    if axes:
+        plot_box = (_MARGIN_LEFT, _MARGIN_TOP, width - _MARGIN_RIGHT, height - _MARGIN_BOTTOM)
+    else:
+        plot_box = (0, 0, width, height)
+    left, top, right, bottom = plot_box
+    plot_w, plot_h = right - left, bottom - top
+
+    grid = _resample_columns(S_db[_row_index(S_db.shape[0], plot_h, sr, y_axis)], plot_w)
+    levels = np.clip((grid - vmin) * ((_LEVELS - 1) / (vmax - vmin)), 0, _LEVELS - 1).astype(np.uint8)
+    plot = Image.fromarray(levels, "L")
+
+    if boxes:
+        _draw_boxes(plot, boxes, duration, sr, y_axis)
+
+    if not axes:
+        canvas = plot
+    else:
+        canvas = Image.new("L", (width, height), _WHITE)
+        canvas.paste(plot, (left, top))
+        _draw_axes(canvas, plot_box, duration, sr, y_axis, vmin, vmax, title)
+    canvas.putpalette(lut.tobytes())  # turns the L image into a palette image
+
+    buffer = io.BytesIO()
+    canvas.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def _draw_boxes(plot, boxes, duration, sr, y_axis):
+    draw = ImageDraw.Draw(plot)
+    width, height = plot.size
+    nyquist = sr / 2.0
+
+    def y_of(hz):
+        if y_axis == "log":
+            lo = np.log(_LOG_FMIN)
+            p = (np.log(max(hz, _LOG_FMIN)) - lo) / (np.log(nyquist) - lo)
+        else:
+            p = hz / nyquist
+        return height - 1 - int(round(min(max(p, 0.0), 1.0) * (height - 1)))
+
+    for t0, t1, f0, f1 in boxes:
+        x0 = int(t0 / max(duration, 1e-9) * (width - 1))
+        x1 = int(t1 / max(duration, 1e-9) * (width - 1))
+        draw.rectangle([x0, y_of(f1), max(x1, x0 + 1), y_of(f0)], outline=_BOX)
+
+
+def save_spectrogram(path, S_db, sr, **kwargs):
+    """render_spectrogram() written to path; returns path."""
+    with open(path, "wb") as f:
+        f.write(render_spectrogram(S_db, sr, **kwargs))
+    return path
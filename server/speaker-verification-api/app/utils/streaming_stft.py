@@ -0,0 +1,83 @@
+# app/utils/streaming_stft.py
+import librosa
+import numpy as np
+import soundfile as sf
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class RunningStats:
+    """
+    Mean and (population) variance accumulated batch by batch with the
+    parallel form of Welford's algorithm, so nothing but the totals is kept.
+    """
+
+    def __init__(self, shape=()):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def update(self, values, axis=None):
+        values = np.asarray(values, dtype=np.float64)
+        n = values.size if axis is None else values.shape[axis]
+        if n == 0:
+            return
+        batch_mean = values.mean(axis=axis)
+        centred = values - (batch_mean if axis is None else np.expand_dims(batch_mean, axis))
+        batch_m2 = np.sum(centred * centred, axis=axis)
+
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + batch_m2 + delta * delta * (self.count * n / total)
+        self.count = total
+
+    @property
+    def var(self):
+        return self.m2 / self.count if self.count else self.m2 * 0.0
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+
+def stream_power_frames(path, n_fft=2048, hop_length=512, block_frames=256):
+    """
+    Yield the power STFT of an audio file as (1 + n_fft/2) x k blocks, reading
+    block_frames hops of audio at a time. Frames match librosa.stft with
+    center=True: the signal is zero-padded by n_fft/2 at both ends, and samples
+    overlapping a block edge are carried into the next block.
+    """
+    window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+    pad = n_fft // 2
+    carry = np.zeros(pad, dtype=np.float32)
+
+    def frames_of(buffer):
+        n = 1 + (len(buffer) - n_fft) // hop_length if len(buffer) >= n_fft else 0
+        if n == 0:
+            return None, buffer
+        frames = sliding_window_view(buffer[:(n - 1) * hop_length + n_fft], n_fft)[::hop_length]
+        spectrum = np.fft.rfft(frames * window, axis=1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32).T
+        return power, buffer[n * hop_length:]
+
+    with sf.SoundFile(path) as f:
+        for block in f.blocks(blocksize=hop_length * block_frames, dtype="float32", always_2d=True):
+            mono = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+            power, carry = frames_of(np.concatenate([carry, mono]))
+            if power is not None:
+                yield power
+    power, _ = frames_of(np.concatenate([carry, np.zeros(pad, dtype=np.float32)]))
+    if power is not None:
+        yield power
+
+
+def frame_count(path, hop_length=512):
+    """Number of STFT frames stream_power_frames will produce for path; 0 for an empty file."""
+    frames = sf.info(path).frames
+    return 1 + frames // hop_length if frames else 0
+
+
+def power_to_db(power, ref_power, amin=1e-10, top_db=80.0):
+    """librosa.power_to_db for one block, with ref fixed to the whole file's peak."""
+    db = 10.0 * np.log10(np.maximum(power, amin)) - 10.0 * np.log10(max(ref_power, amin))
+    return np.maximum(db, -top_db)
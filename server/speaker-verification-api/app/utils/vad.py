@@ -0,0 +1,67 @@
+# app/utils/vad.py
+import numpy as np
+
+
+def speech_regions(samples, sample_rate=16000, frame_ms=30, threshold_db=-35.0, floor_db=-60.0,
+                   min_silence_s=0.3, min_speech_s=0.2, pad_s=0.15):
+    """
+    Energy-based voice activity detection.
+    A frame is speech when its RMS level is within threshold_db of the loudest
+    frame and above an absolute floor_db. Gaps shorter than min_silence_s are
+    bridged, bursts shorter than min_speech_s dropped, and each region is
+    padded by pad_s. Returns a list of (start, end) sample indices.
+    """
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return []  # shorter than one frame
+
+    frames = np.asarray(samples[:n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+    level_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+    active = (level_db > level_db.max() + threshold_db) & (level_db > floor_db)
+
+    # Run starts/ends of active frames
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+    runs = edges.reshape(-1, 2)
+
+    min_gap = int(min_silence_s * 1000 / frame_ms)
+    merged = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] <= min_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    min_len = int(min_speech_s * 1000 / frame_ms)
+    pad = int(pad_s * sample_rate)
+    regions = []
+    for start, end in merged:
+        if end - start < min_len:
+            continue
+        s = max(0, start * frame - pad)
+        e = min(len(samples), end * frame + pad)
+        if regions and s <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], int(e))
+        else:
+            regions.append((int(s), int(e)))
+    return regions
+
+
+def chunk_regions(regions, max_samples):
+    """
+    Group speech regions into chunks of at most max_samples, cutting only at
+    silences where possible. Regions longer than max_samples are split evenly.
+    """
+    chunks = []
+    for start, end in regions:
+        if end - start > max_samples:
+            pieces = int(np.ceil((end - start) / max_samples))
+            bounds = np.linspace(start, end, pieces + 1).astype(int)
+            for s, e in zip(bounds[:-1], bounds[1:]):
+                chunks.append((int(s), int(e)))
+            continue
+        if chunks and end - chunks[-1][0] <= max_samples:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
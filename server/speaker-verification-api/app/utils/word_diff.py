@@ -0,0 +1,134 @@
+# app/utils/word_diff.py
+import re
+
+_WORD_RE = re.compile(r"[\w']+")
+
+
+def tokenize(text):
+    """Lower-cased words with punctuation removed, so 'Hello,' and 'hello' match."""
+    return [word.strip("'") for word in _WORD_RE.findall(text.lower()) if word.strip("'")]
+
+
+def _shortest_edit(a, b, max_d):
+    """
+    Myers' O(ND) greedy forward search over integer sequences.
+    Returns (trace, d) for backtracking, or None when more than max_d edits are needed.
+    """
+    n, m = len(a), len(b)
+    max_d = min(max_d, n + m)
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace = []
+    for d in range(max_d + 1):
+        trace.append(v[offset - d:offset + d + 1])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return trace, d
+    return None
+
+
+def _backtrack(trace, d, n, m):
+    """Per-token moves ('equal' | 'delete' | 'insert') from start to end."""
+    moves = []
+    x, y = n, m
+    for step in range(d, 0, -1):
+        v = trace[step]
+        k = x - y
+        if k == -step or (k != step and v[k - 1 + step] < v[k + 1 + step]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k + step]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            moves.append("equal")
+        if x == prev_x:
+            moves.append("insert")
+        else:
+            moves.append("delete")
+        x, y = prev_x, prev_y
+    while x > 0 and y > 0:
+        x -= 1
+        y -= 1
+        moves.append("equal")
+    moves.reverse()
+    return moves
+
+
+def _group(moves, i0, j0):
+    """Collapse per-token moves into difflib-style opcodes, offset by (i0, j0)."""
+    opcodes = []
+    i, j = i0, j0
+    for tag in moves:
+        if tag == "equal":
+            if opcodes and opcodes[-1][0] == "equal":
+                opcodes[-1][2] += 1
+                opcodes[-1][4] += 1
+            else:
+                opcodes.append(["equal", i, i + 1, j, j + 1])
+            i += 1
+            j += 1
+            continue
+        if not opcodes or opcodes[-1][0] == "equal":
+            opcodes.append(["replace", i, i, j, j])
+        if tag == "delete":
+            opcodes[-1][2] += 1
+            i += 1
+        else:
+            opcodes[-1][4] += 1
+            j += 1
+    for op in opcodes:
+        if op[0] == "replace" and op[1] == op[2]:
+            op[0] = "insert"
+        elif op[0] == "replace" and op[3] == op[4]:
+            op[0] = "delete"
+    return [tuple(op) for op in opcodes]
+
+
+def diff_words(a, b, max_edits=2000):
+    """
+    Align two token lists. Returns difflib-style opcodes
+    (tag, i1, i2, j1, j2) with tag in equal / replace / delete / insert.
+    Common prefix and suffix are stripped first; if the remainder needs more
+    than max_edits edits it is reported as a single replace block.
+    """
+    ids = {}
+    a_ids = [ids.setdefault(word, len(ids)) for word in a]
+    b_ids = [ids.setdefault(word, len(ids)) for word in b]
+
+    n, m = len(a_ids), len(b_ids)
+    prefix = 0
+    while prefix < n and prefix < m and a_ids[prefix] == b_ids[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < n - prefix and suffix < m - prefix and a_ids[n - 1 - suffix] == b_ids[m - 1 - suffix]:
+        suffix += 1
+
+    mid_a = a_ids[prefix:n - suffix]
+    mid_b = b_ids[prefix:m - suffix]
+
+    opcodes = []
+    if prefix:
+        opcodes.append(("equal", 0, prefix, 0, prefix))
+    if mid_a or mid_b:
+        found = _shortest_edit(mid_a, mid_b, max_edits)
+        if found is None:
+            tag = "replace" if mid_a and mid_b else ("delete" if mid_a else "insert")
+            opcodes.append((tag, prefix, n - suffix, prefix, m - suffix))
+        else:
+            trace, d = found
+            opcodes += _group(_backtrack(trace, d, len(mid_a), len(mid_b)), prefix, prefix)
+    if suffix:
+        opcodes.append(("equal", n - suffix, n, m - suffix, m))
+    return opcodes
@@ -0,0 +1,60 @@
+# app/utils/workspace.py
+import os
+import shutil
+import tempfile
+import uuid
+from flask import g, has_request_context
+
+from .. import config
+
+
+def _default_root():
+    """Prefer tmpfs so intermediate audio never touches the disk."""
+    if config.WORKSPACE_ROOT:
+        return config.WORKSPACE_ROOT
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+class Workspace:
+    """
+    A private scratch directory for one request or job.
+    Every intermediate file lives here, so concurrent requests with the same
+    upload filename can never overwrite or delete each other's files.
+    """
+
+    def __init__(self, root=None, prefix="securevox-"):
+        root = root or _default_root()
+        os.makedirs(root, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix=prefix, dir=root)
+
+    def file(self, name):
+        """A path inside the workspace that no other caller will be handed."""
+        base, ext = os.path.splitext(os.path.basename(name))
+        return os.path.join(self.path, f"{base}_{uuid.uuid4().hex[:8]}{ext}")
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+
+def request_workspace():
+    """The workspace bound to the current request, created on first use."""
+    if not has_request_context():
+        raise RuntimeError("request_workspace() called outside of a request")
+    if "workspace" not in g:
+        g.workspace = Workspace()
+    return g.workspace
+
+
+def cleanup_request_workspace(exc=None):
+    """teardown_request hook: remove the request's workspace, if one was created."""
+    workspace = g.pop("workspace", None)
+    if workspace is not None:
+        workspace.cleanup()
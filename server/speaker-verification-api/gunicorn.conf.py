@@ -0,0 +1,27 @@
+# gunicorn -c gunicorn.conf.py wsgi:app
+import os
+
+_cpus = os.cpu_count() or 1
+
+bind = os.environ.get("SECUREVOX_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("SECUREVOX_WORKERS", max(1, _cpus // 4)))
+threads = int(os.environ.get("SECUREVOX_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.environ.get("SECUREVOX_TIMEOUT", 600))  # synchronous /generate-report can take minutes
+
+# Import wsgi.py (and load the models) once in the master before forking
+preload_app = True
+
+# Split the cores between workers instead of every worker spawning one torch thread per core
+torch_threads = int(os.environ.get("SECUREVOX_TORCH_THREADS", max(1, _cpus // workers)))
+
+
+def post_fork(server, worker):
+    import torch
+    from app import config
+    from app.services.job_queue import report_jobs
+
+    torch.set_num_threads(torch_threads)
+    if config.JOB_WORKERS > 0:
+        report_jobs.start()
+    server.log.info(f"Worker {worker.pid}: torch threads={torch_threads}")
@@ -1,3 +1,5 @@
+import os
+
 from app import create_app
 from flask_cors import CORS
 
@@ -5,4 +7,6 @@ app = create_app()
 CORS(app)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    # Development server only; use `gunicorn -c gunicorn.conf.py wsgi:app` in production
+    debug = os.environ.get("FLASK_DEBUG", "1") == "1"
+    app.run(host="0.0.0.0", port=5000, debug=debug)
@@ -0,0 +1,28 @@
+from app.services.metadata_service import _MpegFrameScanner
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding: 417-byte frames of 1152 samples
+_FRAME = b"\xff\xfb\x90\x00" + bytes(413)
+
+
+def _id3_tag(payload_size):
+    """ID3v2.4 tag whose payload is full of bytes that look like MPEG frame syncs."""
+    payload = (b"\xff\xfb\x90\x00" * (payload_size // 4 + 1))[:payload_size]
+    size = bytes((payload_size >> shift) & 0x7F for shift in (21, 14, 7, 0))  # syncsafe
+    return b"ID3\x04\x00\x00" + size + payload
+
+
+def _scan(data, chunk_size=65536):
+    scanner = _MpegFrameScanner()
+    for start in range(0, len(data), chunk_size):
+        scanner.feed(data[start:start + chunk_size])
+    return scanner
+
+
+def test_id3_tag_larger_than_one_chunk_is_skipped():
+    frames = _FRAME * 766  # ~20 s
+    plain = _scan(frames)
+    tagged = _scan(_id3_tag(200 * 1024) + frames)
+
+    assert plain.frames == 766
+    assert tagged.frames == plain.frames
+    assert tagged.bytes_per_second == plain.bytes_per_second
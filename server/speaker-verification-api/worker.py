@@ -0,0 +1,5 @@
+from app.services.job_queue import report_jobs
+
+if __name__ == "__main__":
+    # Dedicated report worker process; shares the SQLite queue with the web server
+    report_jobs.run_forever()
@@ -0,0 +1,19 @@
+import gc
+import os
+
+from app import create_app
+from app.services.model_registry import models
+from flask_cors import CORS
+
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# Job worker threads are started per worker in gunicorn's post_fork hook.
+app = create_app(start_job_workers=False)
+CORS(app)
+
+if os.environ.get("SECUREVOX_PRELOAD_MODELS", "1") == "1":
+    # Load every model in the master so forked workers share the weights copy-on-write
+    models.preload()
+
+# Move everything allocated so far out of the GC's reach; otherwise the first
+# collection in each worker touches every object and un-shares the pages.
+gc.freeze()